@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存音频处理流水线
+格式一致且不需要调速的片段按帧直接拼接，不调用ffmpeg；
+其余情况片段MP3只解码一次为PCM，在内存中拼接、调整语速后只编码一次，
+与ffmpeg之间全部通过管道传递数据，不产生临时文件
+"""
+
+import queue
+import logging
+import threading
+import subprocess
+
+from metrics import registry, stage
+from mp3_frames import Mp3FormatError, join_frames, parse_frames, to_mp3
+
+logger = logging.getLogger(__name__)
+
+MERGES_TOTAL = registry.counter(
+    'tts_audio_merges_total', '多段MP3合并次数（frames=按帧直接拼接, decode=解码后重新编码）', ('path',)
+)
+
+# gTTS返回的音频格式：24kHz 单声道
+SAMPLE_RATE = 24000
+CHANNELS = 1
+SAMPLE_WIDTH = 2  # 16位PCM
+
+
+class AudioPipelineError(Exception):
+    """ffmpeg编解码失败"""
+
+
+def _ffmpeg():
+    from pydub import AudioSegment
+    return AudioSegment.converter
+
+
+def _run_ffmpeg(args, data):
+    """通过管道调用ffmpeg，返回标准输出"""
+    command = [_ffmpeg(), '-hide_banner', '-loglevel', 'error'] + args
+    process = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise AudioPipelineError(process.stderr.decode('utf-8', errors='replace').strip())
+    return process.stdout
+
+
+def decode_mp3(data, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    将MP3字节解码为统一格式的PCM音频（AudioSegment）
+    """
+    from pydub import AudioSegment
+
+    with stage('decode'):
+        pcm = _run_ffmpeg([
+            '-f', 'mp3', '-i', 'pipe:0',
+            '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', str(channels),
+            'pipe:1',
+        ], data)
+    return AudioSegment(data=pcm, sample_width=SAMPLE_WIDTH, frame_rate=sample_rate, channels=channels)
+
+
+def encode_mp3(audio, bitrate=None, headers=True):
+    """
+    将PCM音频（AudioSegment）编码为MP3字节
+    headers=False 时不写ID3标签和Xing头，只输出音频帧，多段结果可以直接首尾相接成一个流
+    """
+    args = [
+        '-f', 's16le', '-ar', str(audio.frame_rate), '-ac', str(audio.channels), '-i', 'pipe:0',
+        '-f', 'mp3',
+    ]
+    if bitrate:
+        args += ['-b:a', bitrate]
+    if not headers:
+        args += ['-id3v2_version', '0', '-write_xing', '0']
+    with stage('encode'):
+        return _run_ffmpeg(args + ['pipe:1'], audio.raw_data)
+
+
+class StreamEncoder:
+    """
+    连续编码器：多段PCM音频依次写入同一个ffmpeg进程，编码器延迟和末尾填充只在整段音频的开头和结尾各出现一次，
+    逐块编码再首尾相接时每个接缝处都会多出一段静音
+    编码结果由后台线程读出，可以边写入边取出（不含ID3标签和Xing头），内存占用与音频总长度无关
+
+    用法:
+        encoder = StreamEncoder()
+        try:
+            encoder.write(audio)
+            data = encoder.read(wait=0.2)
+            ...
+            data = encoder.finish()
+        finally:
+            encoder.close()
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, channels=CHANNELS, bitrate=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        args = ['-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0', '-f', 'mp3']
+        if bitrate:
+            args += ['-b:a', bitrate]
+        # 每个MP3帧编码完成后立即输出，流式接口不必等到缓冲区写满
+        args += ['-id3v2_version', '0', '-write_xing', '0', '-flush_packets', '1', 'pipe:1']
+        self._process = subprocess.Popen(
+            [_ffmpeg(), '-hide_banner', '-loglevel', 'error'] + args,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self._output = queue.Queue()
+        self._reader = threading.Thread(target=self._read_output, name='mp3-encoder', daemon=True)
+        self._reader.start()
+
+    def _read_output(self):
+        while True:
+            data = self._process.stdout.read1(65536)
+            if not data:
+                break
+            self._output.put(data)
+
+    def write(self, audio):
+        """写入一段PCM音频（AudioSegment），采样率和声道数需与编码器一致"""
+        if audio.frame_rate != self.sample_rate or audio.channels != self.channels:
+            audio = audio.set_frame_rate(self.sample_rate).set_channels(self.channels)
+        if audio.sample_width != SAMPLE_WIDTH:
+            audio = audio.set_sample_width(SAMPLE_WIDTH)
+        try:
+            with stage('encode'):
+                self._process.stdin.write(audio.raw_data)
+                self._process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise AudioPipelineError(self._error() or 'ffmpeg编码进程已退出')
+
+    def write_silence(self, duration_ms):
+        """写入指定时长的静音"""
+        from pydub import AudioSegment
+        self.write(AudioSegment.silent(duration=duration_ms, frame_rate=self.sample_rate).set_channels(self.channels))
+
+    def read(self, wait=0.0):
+        """
+        取出目前已编码的MP3字节
+        wait大于0且暂时没有输出时，最多等待wait秒直到有新的输出
+        """
+        pieces = []
+        try:
+            pieces.append(self._output.get(timeout=wait) if wait > 0 else self._output.get_nowait())
+            while True:
+                pieces.append(self._output.get_nowait())
+        except queue.Empty:
+            pass
+        return b''.join(pieces)
+
+    def finish(self):
+        """结束输入，等待编码完成，返回剩余的MP3字节"""
+        self._process.stdin.close()
+        with stage('encode'):
+            self._reader.join()
+            returncode = self._process.wait()
+        if returncode != 0:
+            raise AudioPipelineError(self._error())
+        return self.read()
+
+    def _error(self):
+        try:
+            self._process.wait(timeout=5)
+            return self._process.stderr.read().decode('utf-8', errors='replace').strip()
+        except (subprocess.TimeoutExpired, ValueError, OSError):
+            return ''
+
+    def close(self):
+        """释放编码进程；未调用finish时直接终止"""
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        # 进程退出后标准输出读到结尾，读取线程随之结束
+        self._reader.join()
+        for stream in (self._process.stdin, self._process.stdout, self._process.stderr):
+            try:
+                stream.close()
+            except (OSError, ValueError):
+                pass
+
+
+def change_speed(audio, speed_factor):
+    """
+    调整已解码音频（AudioSegment）的播放速度
+    安装了NumPy时使用WSOLA变速，保持原有音调
+    """
+    if speed_factor == 1.0:
+        return audio
+
+    try:
+        from time_stretch import stretch_pcm16
+    except ImportError:
+        logger.warning("未安装numpy，使用重采样变速（音调会随语速变化）")
+        return resample_speed(audio, speed_factor)
+
+    with stage('speed'):
+        if audio.sample_width != SAMPLE_WIDTH:
+            audio = audio.set_sample_width(SAMPLE_WIDTH)
+        return audio._spawn(stretch_pcm16(audio.raw_data, speed_factor, audio.frame_rate, audio.channels))
+
+
+def resample_speed(audio, speed_factor):
+    """
+    通过修改采样率再重采样的方式变速，音调会随之升高或降低
+    """
+    if speed_factor != 1.0:
+        with stage('speed'):
+            new_sample_rate = int(audio.frame_rate * speed_factor)
+            audio_with_new_speed = audio._spawn(audio.raw_data, overrides={"frame_rate": new_sample_rate})
+            return audio_with_new_speed.set_frame_rate(audio.frame_rate)
+    return audio
+
+
+def concatenate(segments, gap_ms=0):
+    """
+    按顺序拼接多段PCM音频，可在相邻片段之间插入静音
+    """
+    from pydub import AudioSegment
+
+    if not segments:
+        return AudioSegment.silent(duration=0, frame_rate=SAMPLE_RATE)
+
+    frame_rate = segments[0].frame_rate
+    gap = AudioSegment.silent(duration=gap_ms, frame_rate=frame_rate) if gap_ms > 0 else None
+    with stage('merge'):
+        pieces = []
+        for i, segment in enumerate(segments):
+            if i > 0 and gap is not None:
+                pieces.append(gap.raw_data)
+            pieces.append(segment.raw_data)
+        # 一次性拼接字节，避免逐段相加产生的重复拷贝
+        return segments[0]._spawn(b''.join(pieces))
+
+
+def audio_frames(data):
+    """
+    去掉MP3的ID3标签和Xing/Info头，只保留音频帧，多段结果可以直接首尾相接成一个流
+    无法解析时原样返回
+    """
+    try:
+        return parse_frames(data).data
+    except Mp3FormatError:
+        return data
+
+
+def _join_frames(segment_audio, groups, gap_ms):
+    """按帧拼接，格式不一致或无法解析时返回None"""
+    try:
+        with stage('merge'):
+            frames = [parse_frames(data) for data in segment_audio]
+            spans = {span: join_frames(frames[span[0]:span[1]]) for span in set(groups) if span[1] > span[0]}
+            data = to_mp3(join_frames([spans[span] for span in groups if span in spans], gap_ms))
+    except Mp3FormatError as e:
+        logger.info(f"无法按帧拼接，改为解码后重新编码: {e}")
+        return None
+    MERGES_TOTAL.inc(path='frames')
+    return data
+
+
+def compose_segments(segment_audio, groups, speed_factor=1.0, gap_ms=0):
+    """
+    将片段MP3按组拼接成一个MP3：组内片段直接相接，相邻两组之间插入静音
+    所有片段格式相同（gTTS总是24kHz单声道）且无需调速时按帧直接拼接，只有文件读写；
+    格式不一致或需要调速时解码一次、拼接、调整语速、编码一次
+
+    参数:
+    - segment_audio: 片段MP3字节列表
+    - groups: 按输出顺序排列的 (起始下标, 结束下标) 列表，同一组可以出现多次，只解码一次
+    - speed_factor: 语速倍率，1.0表示不调整
+    - gap_ms: 相邻两组之间的静音时长（毫秒）
+
+    返回:
+    - MP3字节
+    """
+    if speed_factor == 1.0:
+        data = _join_frames(segment_audio, groups, gap_ms)
+        if data is not None:
+            return data
+
+    try:
+        import pydub  # noqa: F401
+    except ImportError:
+        logger.warning("未安装pydub，无法调整语速，直接按帧拼接")
+        data = _join_frames(segment_audio, groups, gap_ms) if speed_factor != 1.0 else None
+        if data is None:
+            # 无法解析的数据只能简单连接（可能有问题）
+            data = b''.join(segment_audio[i] for start, end in groups for i in range(start, end))
+        return data
+
+    MERGES_TOTAL.inc(path='decode')
+    decoded = [decode_mp3(data) for data in segment_audio]
+    group_audio = {span: concatenate(decoded[span[0]:span[1]]) for span in set(groups)}
+    combined = concatenate([group_audio[span] for span in groups], gap_ms)
+    combined = change_speed(combined, speed_factor)
+    return encode_mp3(combined)
+
+
+def render_segments(segment_audio, speed_factor=1.0, gap_ms=0):
+    """
+    将多个片段MP3合成一个MP3：格式一致且无需调速时按帧拼接，否则解码一次、拼接、调整语速、编码一次
+
+    参数:
+    - segment_audio: 按顺序排列的片段MP3字节列表
+    - speed_factor: 语速倍率，1.0表示不调整
+    - gap_ms: 片段之间的静音时长（毫秒）
+
+    返回:
+    - MP3字节
+    """
+    if len(segment_audio) == 1 and speed_factor == 1.0:
+        # 单个片段且无需调速，直接使用原始数据，无需编解码
+        return segment_audio[0]
+
+    return compose_segments(segment_audio, [(i, i + 1) for i in range(len(segment_audio))], speed_factor, gap_ms)
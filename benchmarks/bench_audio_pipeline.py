@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音频处理流水线基准测试
+对比三种流程的墙钟时间和CPU时间:
+- 旧流程: 片段写临时文件 -> pydub逐个解码拼接后编码 -> 再解码、重采样变速、编码（重构前的实现）
+- 解码流程: 内存中解码一次、拼接、调速、编码一次
+- 新流程: render_segments，正常语速（--speed 2）时按帧直接拼接，不调用ffmpeg
+
+用法:
+    python benchmarks/bench_audio_pipeline.py --segments 6 --speed 3 --rounds 10
+    python benchmarks/bench_audio_pipeline.py --segments 6 --speed 2 --rounds 10
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_pipeline import change_speed, concatenate, decode_mp3, encode_mp3, render_segments  # noqa: E402
+from pydub import AudioSegment  # noqa: E402
+
+SPEED_FACTORS = [0.5, 0.7, 1.0, 1.3, 1.6]
+
+
+def make_segment(seconds, frequency):
+    """用ffmpeg生成与gTTS格式一致的测试片段（24kHz 单声道 MP3）"""
+    command = [
+        AudioSegment.converter, '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency={frequency}:duration={seconds}',
+        '-ar', '24000', '-ac', '1', '-b:a', '32k', '-f', 'mp3', 'pipe:1',
+    ]
+    return subprocess.run(command, stdout=subprocess.PIPE, check=True).stdout
+
+
+def legacy_merge(audio_files, output_path):
+    """重构前的 merge_audio_files：逐个解码后相加，再整体编码"""
+    combined = AudioSegment.empty()
+    for audio_file in audio_files:
+        combined += AudioSegment.from_mp3(str(audio_file))
+    combined.export(str(output_path), format="mp3")
+
+
+def legacy_adjust_speed(audio_path, speed_factor):
+    """重构前的 adjust_audio_speed：重新解码后通过修改采样率变速（音调随之变化）"""
+    audio = AudioSegment.from_mp3(str(audio_path))
+    if speed_factor != 1.0:
+        new_sample_rate = int(audio.frame_rate * speed_factor)
+        audio_with_new_speed = audio._spawn(audio.raw_data, overrides={"frame_rate": new_sample_rate})
+        return audio_with_new_speed.set_frame_rate(audio.frame_rate)
+    return audio
+
+
+def legacy_render(segment_audio, output_path, speed_factor):
+    """旧流程：与重构前的 text_to_speech 混合文本分支一致"""
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        audio_files = []
+        for i, data in enumerate(segment_audio):
+            temp_file = temp_dir / f"segment_{i}.mp3"
+            temp_file.write_bytes(data)
+            audio_files.append(temp_file)
+        if len(audio_files) == 1:
+            shutil.copy(audio_files[0], output_path)
+        else:
+            legacy_merge(audio_files, output_path)
+        if speed_factor != 1.0:
+            adjusted_audio = legacy_adjust_speed(output_path, speed_factor)
+            adjusted_audio.export(str(output_path), format="mp3")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def decode_render(segment_audio, output_path, speed_factor):
+    """解码流程：内存中一次解码、一次编码"""
+    combined = change_speed(concatenate([decode_mp3(data) for data in segment_audio]), speed_factor)
+    Path(output_path).write_bytes(encode_mp3(combined))
+
+
+def pipeline_render(segment_audio, output_path, speed_factor):
+    """新流程：无需调速时按帧拼接，否则与解码流程相同"""
+    Path(output_path).write_bytes(render_segments(segment_audio, speed_factor))
+
+
+def cpu_seconds():
+    """本进程与子进程（ffmpeg）累计的CPU时间"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(fn, segment_audio, speed_factor, rounds):
+    output_path = Path(tempfile.mkdtemp()) / 'bench.mp3'
+    fn(segment_audio, output_path, speed_factor)  # 预热
+
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    for _ in range(rounds):
+        fn(segment_audio, output_path, speed_factor)
+    wall = (time.perf_counter() - wall_start) / rounds
+    cpu = (cpu_seconds() - cpu_start) / rounds
+    shutil.rmtree(output_path.parent, ignore_errors=True)
+    return wall, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='音频处理流水线基准测试')
+    parser.add_argument('--segments', type=int, default=6, help='每个请求的片段数')
+    parser.add_argument('--seconds', type=float, default=1.5, help='每个片段的时长（秒）')
+    parser.add_argument('--speed', type=int, default=3, choices=range(5), help='语速档位')
+    parser.add_argument('--rounds', type=int, default=10, help='每种流程重复次数')
+    args = parser.parse_args()
+
+    segment_audio = [make_segment(args.seconds, 300 + 50 * i) for i in range(args.segments)]
+    speed_factor = SPEED_FACTORS[args.speed]
+
+    print(f"片段数: {args.segments}, 片段时长: {args.seconds}s, 语速倍率: {speed_factor}, 重复: {args.rounds}")
+    results = {}
+    for name, fn in [('旧流程', legacy_render), ('解码流程', decode_render), ('新流程', pipeline_render)]:
+        wall, cpu = measure(fn, segment_audio, speed_factor, args.rounds)
+        results[name] = (wall, cpu)
+        print(f"{name}: 墙钟 {wall * 1000:.1f} ms/请求, CPU {cpu * 1000:.1f} ms/请求")
+
+    old_wall, old_cpu = results['旧流程']
+    new_wall, new_cpu = results['新流程']
+    print(f"加速: 墙钟 {old_wall / new_wall:.2f}x, CPU {old_cpu / new_cpu:.2f}x")
+    decode_wall, decode_cpu = results['解码流程']
+    print(f"相对解码流程: 墙钟 {decode_wall / new_wall:.2f}x, CPU {decode_cpu / new_cpu:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中英文分段微基准测试
+对比原有的逐字符实现（detect_language + split_mixed_text，逐字拼接字符串）
+与 segmenter.segment_text 单次正则扫描在 10KB~1MB 混合文本上的耗时
+
+用法:
+    python benchmarks/bench_segmentation.py --sizes 10,100,1000 --rounds 5
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from segmenter import segment_text  # noqa: E402
+
+WORDS = ['apple', 'banana', 'focus on', 'Big Ben', "Father's Day", 'library', 'take care of']
+CHINESE = ['苹果', '香蕉', '专注于', '大本钟', '父亲节', '图书馆', '照顾', '今天天气很好', '㐀㐁']
+PUNCTUATION = ['，', '。', ', ', '. ', ' ', '！', '3个', ' 2024 ']
+
+
+def legacy_detect_language(text):
+    """原有实现"""
+    chinese_count = 0
+    english_count = 0
+    for char in text:
+        if '一' <= char <= '鿿':
+            chinese_count += 1
+        elif char.isascii() and char.isalpha():
+            english_count += 1
+    if chinese_count + english_count == 0:
+        return 'zh-CN'
+    if chinese_count > 0 and english_count > 0:
+        return 'mixed'
+    elif chinese_count > 0:
+        return 'zh-CN'
+    else:
+        return 'en-US'
+
+
+def legacy_split_mixed_text(text):
+    """原有实现"""
+    segments = []
+    current_segment = ""
+    current_lang = None
+    for char in text:
+        if '一' <= char <= '鿿':
+            if current_lang == 'en' and current_segment.strip():
+                segments.append(('en-US', current_segment.strip()))
+                current_segment = ""
+            current_lang = 'zh'
+            current_segment += char
+        elif char.isascii() and char.isalpha():
+            if current_lang == 'zh' and current_segment.strip():
+                segments.append(('zh-CN', current_segment.strip()))
+                current_segment = ""
+            current_lang = 'en'
+            current_segment += char
+        else:
+            current_segment += char
+    if current_segment.strip():
+        if current_lang == 'zh':
+            segments.append(('zh-CN', current_segment.strip()))
+        elif current_lang == 'en':
+            segments.append(('en-US', current_segment.strip()))
+    return segments
+
+
+def legacy_segment_text(text):
+    """原有的 text_to_speech 分段流程：先检测语言，混合文本再逐字符分割"""
+    lang = legacy_detect_language(text)
+    if lang == 'mixed':
+        return legacy_split_mixed_text(text)
+    return [(lang, text)]
+
+
+def make_text(size_kb, run_length=1, seed=42):
+    """
+    生成约 size_kb KB（UTF-8）的中英文混合文本
+    run_length 为连续同一语言的词数：1表示逐词交替（最坏情况），较大时接近分段落的双语文档
+    """
+    rng = random.Random(seed)
+    pieces = []
+    size = 0
+    english = True
+    while size < size_kb * 1024:
+        if rng.random() < 1 / run_length:
+            english = not english
+        piece = rng.choice(WORDS) if english else rng.choice(CHINESE)
+        piece += rng.choice(PUNCTUATION)
+        pieces.append(piece)
+        size += len(piece.encode('utf-8'))
+    return ''.join(pieces)
+
+
+def measure(fn, text, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='中英文分段微基准测试')
+    parser.add_argument('--sizes', default='10,100,1000', help='文本大小（KB），逗号分隔')
+    parser.add_argument('--runs', default='1,50', help='连续同一语言的词数，逗号分隔')
+    parser.add_argument('--rounds', type=int, default=5, help='重复次数，取最快一次')
+    args = parser.parse_args()
+
+    print(f"{'大小(KB)':>9} {'连续词数':>8} {'片段数':>8} {'原实现(ms)':>11} {'正则(ms)':>10} {'加速':>7}")
+    for run_length in [int(r) for r in args.runs.split(',')]:
+        for size_kb in [int(s) for s in args.sizes.split(',')]:
+            text = make_text(size_kb, run_length)
+            legacy, _ = measure(legacy_segment_text, text, args.rounds)
+            current, segments = measure(segment_text, text, args.rounds)
+            print(f"{size_kb:>9} {run_length:>8} {len(segments):>8} {legacy * 1000:>11.1f} "
+                  f"{current * 1000:>10.1f} {legacy / current:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成服务压力测试
+按Excel词表的真实分布（单词、单词重复、单词+中文）构造请求，以指定并发驱动 /api/synthesize，
+统计延迟分位数、吞吐量、CPU和内存，并拆分 语言分段 / TTS / 合并 / 变速 各阶段耗时
+
+默认在当前进程内启动服务器并使用离线 stub 后端，不访问Google：
+    python benchmarks/load_test.py --requests 500 --concurrency 16 --output results.json
+
+指定Excel词表（读取C列单词和J列中文）：
+    python benchmarks/load_test.py --vocab 音频缺少数据_cleaned.xlsx
+
+压测已运行的服务器（此时无法拆分阶段耗时）：
+    python benchmarks/load_test.py --url http://localhost:8080
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# 内置的小词表，未指定 --vocab 时使用
+SAMPLE_VOCAB = [
+    ('apple', '苹果'), ('banana', '香蕉'), ('focus on', '专注于'), ('would', '将会'),
+    ('Big Ben', '大本钟'), ('Colombia', '哥伦比亚'), ("Father's Day", '父亲节'),
+    ('mid', '中间的'), ('library', '图书馆'), ('environment', '环境'), ('take care of', '照顾'),
+    ('basketball', '篮球'), ('weather', '天气'), ('delicious', '美味的'), ('grandmother', '祖母'),
+]
+
+# 与 read_excel.py 的E~I列对应的请求形态及其权重
+REQUEST_SHAPES = [
+    ('word', 3),
+    ('wordword', 2),
+    ('wordchinese', 2),
+    ('wordwordchinese', 2),
+    ('wordwordword', 1),
+]
+
+STAGES = ['segment_text', 'tts', 'merge', 'speed']
+
+
+def load_vocab(path, limit=None):
+    """从Excel读取 (单词, 中文) 列表，使用只读模式逐行读取"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    sheet = workbook.active
+    vocab = []
+    for row in sheet.iter_rows(min_row=2, values_only=True):
+        word, chinese = row[2], row[9]
+        if word and chinese and str(word).strip() and str(chinese).strip():
+            vocab.append((str(word).strip(), str(chinese).strip()))
+            if limit and len(vocab) >= limit:
+                break
+    workbook.close()
+    return vocab
+
+
+def build_requests(vocab, count, speeds, seed):
+    """按请求形态权重随机生成请求体列表"""
+    rng = random.Random(seed)
+    shapes = [shape for shape, weight in REQUEST_SHAPES for _ in range(weight)]
+    requests_list = []
+    for _ in range(count):
+        word, chinese = rng.choice(vocab)
+        shape = rng.choice(shapes)
+        text = shape.replace('word', '\x00').replace('chinese', '\x01')
+        text = text.replace('\x00', word).replace('\x01', chinese)
+        requests_list.append({'text': text, 'speed': rng.choice(speeds)})
+    return requests_list
+
+
+class StageTimer:
+    """线程安全的阶段耗时统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {stage: 0.0 for stage in STAGES}
+        self.counts = {stage: 0 for stage in STAGES}
+
+    def wrap(self, stage, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.totals[stage] += elapsed
+                    self.counts[stage] += 1
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            for stage in STAGES:
+                self.totals[stage] = 0.0
+                self.counts[stage] = 0
+
+
+def instrument_server(server, timer):
+    """给服务器各阶段函数包上计时器（仅进程内模式）"""
+    import audio_pipeline
+
+    server.segment_text = timer.wrap('segment_text', server.segment_text)
+    server.backend_synthesize = timer.wrap('tts', server.backend_synthesize)
+
+    # 解码/编码和按帧拼接都属于合并阶段；render_segments 通过 audio_pipeline 模块调用，组合模式通过 server 模块调用
+    decode = timer.wrap('merge', audio_pipeline.decode_mp3)
+    encode = timer.wrap('merge', audio_pipeline.encode_mp3)
+    speed = timer.wrap('speed', audio_pipeline.change_speed)
+    audio_pipeline.decode_mp3 = server.decode_mp3 = decode
+    audio_pipeline.encode_mp3 = server.encode_mp3 = encode
+    audio_pipeline.change_speed = server.change_speed = speed
+    # 无需调速时按帧拼接（_join_frames 内部调用 join_frames，只包外层，避免重复计时）
+    audio_pipeline._join_frames = timer.wrap('merge', audio_pipeline._join_frames)
+    # 流式和长文本分块：逐块去掉文件头，需要调速时写入连续编码器
+    server.audio_frames = timer.wrap('merge', server.audio_frames)
+    encoder = audio_pipeline.StreamEncoder
+    encoder.write = timer.wrap('merge', encoder.write)
+    encoder.finish = timer.wrap('merge', encoder.finish)
+
+
+def start_local_server(args, timer):
+    """在后台线程中启动使用 stub 后端的服务器，返回基础URL"""
+    work_dir = Path(tempfile.mkdtemp(prefix='tts-load-'))
+    os.environ.setdefault('TTS_BACKEND', 'stub')
+    os.environ.setdefault('TTS_STUB_DELAY', str(args.stub_delay))
+    os.environ.setdefault('TTS_OUTPUT_DIR', str(work_dir / 'output'))
+    os.environ.setdefault('TTS_SEGMENT_CACHE_DIR', str(work_dir / 'segments'))
+
+    import logging
+    logging.disable(logging.INFO)
+
+    import server
+    from werkzeug.serving import make_server
+
+    instrument_server(server, timer)
+    http_server = make_server('127.0.0.1', 0, server.create_app(), threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{http_server.server_port}", work_dir
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def current_rss_mb():
+    """当前常驻内存（MB），不支持 /proc 时返回峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run_load(base_url, bodies, concurrency):
+    """以固定并发发送请求，返回每个请求的 (延迟, 是否成功, 是否复用)"""
+    import requests
+
+    local = threading.local()
+
+    def send(body):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}/api/synthesize", json=body, timeout=300)
+            ok = response.status_code == 200
+            cached = ok and response.json().get('cached', False)
+        except requests.RequestException:
+            ok, cached = False, False
+        return time.perf_counter() - start, ok, cached
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(send, bodies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成服务压力测试')
+    parser.add_argument('--url', help='压测已运行的服务器；不指定时在进程内启动 stub 后端服务器')
+    parser.add_argument('--vocab', help='Excel词表路径（C列单词，J列中文）')
+    parser.add_argument('--vocab-limit', type=int, default=None, help='最多读取的词条数')
+    parser.add_argument('--requests', type=int, default=300, help='请求总数')
+    parser.add_argument('--warmup', type=int, default=10, help='预热请求数（不计入统计）')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发数')
+    parser.add_argument('--speeds', default='2', help='语速档位，逗号分隔，如 0,2,3')
+    parser.add_argument('--stub-delay', type=float, default=0.3, help='stub 后端模拟延迟（秒）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON保存路径')
+    args = parser.parse_args()
+
+    vocab = load_vocab(args.vocab, args.vocab_limit) if args.vocab else SAMPLE_VOCAB
+    speeds = [int(s) for s in args.speeds.split(',')]
+    bodies = build_requests(vocab, args.warmup + args.requests, speeds, args.seed)
+
+    timer = StageTimer()
+    if args.url:
+        base_url, work_dir = args.url.rstrip('/'), None
+    else:
+        base_url, work_dir = start_local_server(args, timer)
+
+    print(f"目标: {base_url}, 词条: {len(vocab)}, 请求: {args.requests}, 并发: {args.concurrency}")
+    run_load(base_url, bodies[:args.warmup], args.concurrency)
+    timer.reset()
+
+    rss_before = current_rss_mb()
+    cpu_start = cpu_seconds()
+    wall_start = time.perf_counter()
+    results = run_load(base_url, bodies[args.warmup:], args.concurrency)
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+
+    latencies = sorted(latency for latency, _, _ in results)
+    succeeded = sum(1 for _, ok, _ in results if ok)
+    summary = {
+        'requests': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'cached': sum(1 for _, _, cached in results if cached),
+        'wallSeconds': round(wall, 3),
+        'requestsPerSecond': round(len(results) / wall, 2) if wall else 0.0,
+        'latencyMs': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        'cpuSeconds': round(cpu, 3),
+        'cpuMsPerRequest': round(cpu / len(results) * 1000, 2) if results else 0.0,
+        'rssMb': {'before': round(rss_before, 1), 'after': round(current_rss_mb(), 1)},
+    }
+
+    stages = None
+    if not args.url:
+        stages = {
+            stage: {
+                'calls': timer.counts[stage],
+                'totalMs': round(timer.totals[stage] * 1000, 1),
+                'msPerRequest': round(timer.totals[stage] * 1000 / len(results), 2) if results else 0.0,
+            }
+            for stage in STAGES
+        }
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'url': args.url, 'vocab': args.vocab, 'vocabSize': len(vocab), 'concurrency': args.concurrency,
+            'speeds': speeds, 'stubDelay': None if args.url else args.stub_delay, 'seed': args.seed,
+        },
+        'summary': summary,
+        'stages': stages,
+    }
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+
+    if work_dir is not None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
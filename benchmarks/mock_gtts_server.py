@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟的Google翻译TTS上游
+接受gTTS的 batchexecute 请求，返回与真实接口格式一致的响应（静音MP3帧）；
+可以模拟延迟、限流（超过速率返回429）和随机5xx，用于测试连接池、限流、重试和熔断
+
+用法:
+    python benchmarks/mock_gtts_server.py --port 9100 --rate 20 --error-rate 0.1
+    TTS_GTTS_BASE_URL=http://127.0.0.1:9100 python server.py --headless
+
+GET /stats 返回请求数、各状态码数量和TCP连接数（连接数远小于请求数说明连接被复用）
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from upstream import TokenBucket  # noqa: E402
+
+# MPEG-2 Layer III, 32kbps, 24kHz, 单声道（与gTTS输出一致）
+_FRAME = bytes([0xFF, 0xF3, 0x44, 0xC4]) + bytes(92)
+
+
+class MockState:
+    def __init__(self, rate, error_rate, latency, retry_after, seed=None):
+        self.limiter = TokenBucket(rate, max(1, int(rate)))
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.statuses = {}
+
+    def count(self, status):
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'connections': self.connections, 'statuses': dict(self.statuses)}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body, content_type='application/json; charset=utf-8', headers=None):
+            state.count(status)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, json.dumps(state.stats()).encode('utf-8'))
+            else:
+                self._reply(404, b'{}')
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode('utf-8')
+            with state.lock:
+                state.requests += 1
+            if not self.path.endswith('/batchexecute'):
+                self._reply(404, b'{}')
+                return
+
+            if not state.limiter.try_acquire():
+                self._reply(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(state.retry_after)})
+                return
+            if state.latency:
+                time.sleep(state.latency * (0.5 + state.rng.random()))
+            if state.rng.random() < state.error_rate:
+                self._reply(503, b'Service Unavailable', 'text/plain')
+                return
+
+            try:
+                rpc = json.loads(parse_qs(body)['f.req'][0])
+                text = json.loads(rpc[0][0][1])[0]
+            except (KeyError, IndexError, ValueError):
+                self._reply(400, b'{}')
+                return
+            # 时长按文本长度估算，约每字符0.1秒
+            frames = max(1, int(len(text) * 0.1 / (576 / 24000)))
+            audio = base64.b64encode(_FRAME * frames).decode('ascii')
+            payload = json.dumps([['wrb.fr', 'jQ1olc', json.dumps([audio]), None, None, None, 'generic']],
+                                 separators=(',', ':'))
+            self._reply(200, f")]}}'\n\n{len(payload)}\n{payload}\n".encode('utf-8'))
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟的Google翻译TTS上游')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--rate', type=float, default=0, help='每秒最多处理的请求数，超过返回429；0表示不限')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回503的比例')
+    parser.add_argument('--latency', type=float, default=0.05, help='平均响应延迟（秒）')
+    parser.add_argument('--retry-after', type=int, default=1, help='429响应的Retry-After（秒）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args()
+
+    state = MockState(args.rate, args.error_rate, args.latency, args.retry_after, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    server.daemon_threads = True
+    print(f"模拟gTTS上游: http://{args.host}:{args.port} (速率 {args.rate or '不限'}/s, 错误率 {args.error_rate})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(state.stats(), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量音频生成流水线
+任务可以是列表，也可以是逐行读取表格得到的生成器，边读边交给线程池并发执行，
+同时提交的任务数有上限，内存占用与表格大小无关；支持失败重试、进度/剩余时间显示和断点续跑
+"""
+
+import os
+import time
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 单个音频任务：行号、列名、合成文本、输出文件名、组合模式的部分列表（可选）
+AudioJob = namedtuple('AudioJob', ['row', 'column', 'text', 'filename', 'parts'], defaults=(None,))
+
+
+class RetryableError(Exception):
+    """可重试的错误（网络错误、429、5xx）"""
+
+
+class Checkpoint:
+    """
+    断点文件：每完成一个任务追加一行文件名
+    重新运行时跳过已完成的任务
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+
+    def mark(self, filename):
+        with self._lock:
+            self.done.add(filename)
+            if self._file:
+                self._file.write(filename + '\n')
+                self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def list_existing_files(output_dir):
+    """
+    一次性列出已生成的所有文件名：查询输出索引，并包括直接放在输出目录下的旧文件
+    """
+    from output_store import INDEX_NAME, OutputStore
+
+    try:
+        existing = {name for name in os.listdir(output_dir) if name.endswith('.mp3')}
+    except FileNotFoundError:
+        return set()
+    if os.path.exists(os.path.join(output_dir, INDEX_NAME)):
+        store = OutputStore(output_dir)
+        existing |= store.names()
+        store.close()
+    return existing
+
+
+class SkipCounter:
+    """filter_jobs 跳过的任务数"""
+
+    def __init__(self):
+        self.count = 0
+
+
+def filter_jobs(planned_jobs, existing, checkpoint=None, skipped=None):
+    """
+    逐个过滤掉已存在或已完成的任务，skipped（SkipCounter）记录跳过数量
+
+    返回:
+    - 待执行任务的生成器
+    """
+    seen = set()
+    done = checkpoint.done if checkpoint else set()
+    for job in planned_jobs:
+        if job.filename in existing or job.filename in done or job.filename in seen:
+            if skipped is not None:
+                skipped.count += 1
+            continue
+        seen.add(job.filename)
+        yield job
+
+
+class HttpSynthesizer:
+    """
+    通过HTTP接口合成，复用连接池
+    """
+
+    def __init__(self, base_url, pool_size=8, speed=2, timeout=120, gap_ms=0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = base_url
+        self.speed = speed
+        self.gap_ms = gap_ms
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __call__(self, job):
+        import requests
+
+        payload = {'text': job.text, 'speed': self.speed, 'filename': job.filename}
+        if job.parts:
+            payload.update({'parts': list(job.parts), 'gapMs': self.gap_ms})
+
+        try:
+            response = self.session.post(self.base_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RetryableError(f"网络错误: {e}")
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RetryableError(f"API调用失败: {response.status_code}")
+        if response.status_code != 200:
+            raise RuntimeError(f"API调用失败: {response.status_code}")
+
+        result = response.json()
+        if not result.get('success'):
+            raise RuntimeError(f"生成失败: {result.get('error')}")
+        return result.get('audioUrl')
+
+    def close(self):
+        self.session.close()
+
+
+class InProcessSynthesizer:
+    """
+    在当前进程内直接调用合成流程，不经过HTTP
+    生成的文件与服务器一样登记到输出索引
+    """
+
+    def __init__(self, output_dir, speed=2, gap_ms=0):
+        # server 在导入时读取输出目录
+        os.environ.setdefault('TTS_OUTPUT_DIR', output_dir)
+        import server
+
+        self.server = server
+        self.speed = speed
+        self.gap_ms = gap_ms
+
+    def __call__(self, job):
+        filename, error_msg, _ = self.server.render_text(
+            job.text, self.speed, job.filename, parts=job.parts, gap_ms=self.gap_ms
+        )
+        if not filename:
+            raise RetryableError(error_msg)
+        return f"/output/{filename}"
+
+    def close(self):
+        pass
+
+
+class ProgressReporter:
+    """
+    进度与剩余时间显示
+    任务边读边提交、总数未知时（total为None），按已读到的行号占表格总行数的比例估算任务总数；
+    表格行数也未知时只显示已完成数和速率
+    """
+
+    def __init__(self, total, interval=2.0, total_rows=None):
+        self.total = total
+        self.total_rows = total_rows
+        self.interval = interval
+        self.submitted = 0
+        self.last_row = 0
+        self.completed = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+        self._reported = None
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        """记录一个已提交的任务"""
+        with self._lock:
+            self.submitted += 1
+            self.last_row = max(self.last_row, job.row)
+
+    def all_submitted(self):
+        """任务已全部提交，总数从估算值变为确定值"""
+        with self._lock:
+            self.total = self.submitted
+
+    def estimated_total(self):
+        """任务总数：已确定时返回实际值，否则按读取进度估算，无法估算时返回None"""
+        if self.total is not None:
+            return self.total
+        if not self.total_rows or not self.last_row:
+            return None
+        rows_read = min(self.last_row, self.total_rows)
+        return max(self.submitted, round(self.submitted * self.total_rows / rows_read))
+
+    def update(self, success):
+        with self._lock:
+            if success:
+                self.completed += 1
+            else:
+                self.failed += 1
+            now = time.monotonic()
+            finished = self.completed + self.failed
+            if now - self._last_report >= self.interval or finished == self.total:
+                self._report(now)
+
+    def finish(self):
+        """输出最后一次进度（如果还没有输出过）"""
+        with self._lock:
+            if self._reported != self.completed + self.failed:
+                self._report(time.monotonic())
+
+    def _report(self, now):
+        self._last_report = now
+        self._reported = self.completed + self.failed
+        print(self.format(now))
+
+    def format(self, now=None):
+        now = now or time.monotonic()
+        finished = self.completed + self.failed
+        elapsed = now - self.started
+        rate = finished / elapsed if elapsed > 0 else 0.0
+        total = self.estimated_total()
+        if total is None:
+            return f"  进度: {finished} 速率 {rate:.1f}/s 失败 {self.failed}"
+        remaining = max(0, total - finished) / rate if rate > 0 else 0
+        percent = min(100.0, finished / total * 100) if total else 100.0
+        eta = time.strftime('%H:%M:%S', time.gmtime(remaining))
+        approx = '' if self.total is not None else '约'
+        return (f"  进度: {finished}/{approx}{total} ({percent:.1f}%) "
+                f"速率 {rate:.1f}/s 预计剩余 {eta} 失败 {self.failed}")
+
+
+def run_with_retry(synthesize, job, retries=3, backoff=1.0):
+    """执行单个任务，可重试错误按指数退避加随机抖动重试"""
+    attempt = 0
+    while True:
+        try:
+            return synthesize(job)
+        except RetryableError:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+            attempt += 1
+
+
+def run_jobs(jobs, synthesize, workers=4, retries=3, backoff=1.0, checkpoint=None, total_rows=None):
+    """
+    并发执行任务；jobs可以是列表或生成器，最多同时提交 workers*4 个任务
+    jobs为生成器时，total_rows（表格数据行数）用于估算任务总数和剩余时间
+
+    返回:
+    - (成功数量, 失败任务列表) 元组
+    """
+    progress = ProgressReporter(len(jobs) if hasattr(jobs, '__len__') else None, total_rows=total_rows)
+    failures = []
+
+    def collect(done):
+        for future in done:
+            job = futures.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                failures.append((job, str(e)))
+                print(f"    ✗ 第{job.row}行 {job.column}列 {job.filename}: {e}")
+                progress.update(False)
+                continue
+            if checkpoint:
+                checkpoint.mark(job.filename)
+            progress.update(True)
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for job in jobs:
+            progress.submit(job)
+            futures[executor.submit(run_with_retry, synthesize, job, retries, backoff)] = job
+            if len(futures) >= workers * 4:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                collect(done)
+        progress.all_submitted()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    progress.finish()
+    return progress.completed, failures
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本分块
+按句子边界切分文本，供流式合成按块依次输出
+"""
+
+import re
+
+# 句末标点：中文句号/叹号/问号/分号/省略号，英文叹号/问号/分号，以及后面跟空白的英文句号
+# 句末标点后紧跟的引号、括号归入同一句
+_SENTENCE_END = re.compile(
+    r'(?:[。！？；!?;…]+|\.(?=\s|$))[”’"\'）)」』]*'
+    r'|\n+'
+)
+_WORD = re.compile(r'\w')
+
+
+def split_sentences(text):
+    """
+    按句子边界切分文本，保留句末标点，去掉空白句子
+
+    例如 "你好。How are you? 我很好" -> ["你好。", "How are you?", "我很好"]
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+        _append_sentence(sentences, text[start:end])
+        start = end
+    _append_sentence(sentences, text[start:])
+    return sentences
+
+
+def _append_sentence(sentences, sentence):
+    sentence = sentence.strip()
+    if not sentence:
+        return
+    if not _WORD.search(sentence):
+        # 只有标点的部分并入上一句，避免产生无法朗读的块
+        if sentences:
+            sentences[-1] += sentence
+        return
+    sentences.append(sentence)
+
+
+
+# 句内可以断开的位置：逗号、顿号、冒号等
+_CLAUSE_END = re.compile(r'[，,、：:—]+[”’"\'）)」』]*')
+_CJK = re.compile(r'[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]')
+
+
+def _split_long(sentence, max_chars):
+    """把超过max_chars的句子依次按逗号等、空白切开，仍然过长时按长度硬切"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+
+    pieces = []
+    start = 0
+    for match in _CLAUSE_END.finditer(sentence):
+        pieces.append(sentence[start:match.end()])
+        start = match.end()
+    pieces = [piece for piece in pieces + [sentence[start:]] if piece.strip()]
+    if len(pieces) == 1:
+        pieces = sentence.split()
+    if len(pieces) == 1:
+        return [sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars)]
+
+    result = []
+    for piece in pieces:
+        result.extend(_split_long(piece.strip(), max_chars))
+    return _merge(result, max_chars)
+
+
+def _join(left, right):
+    """中文之间直接相连，其他情况用空格隔开"""
+    if _CJK.match(left[-1]) or _CJK.match(right[0]):
+        return left + right
+    return left + ' ' + right
+
+
+def _merge(pieces, max_chars):
+    """把相邻的短片段合并，每块不超过max_chars"""
+    merged = []
+    for piece in pieces:
+        if merged and len(merged[-1]) + len(piece) + 1 <= max_chars:
+            merged[-1] = _join(merged[-1], piece)
+        else:
+            merged.append(piece)
+    return merged
+
+
+def chunk_text(text, max_chars=100):
+    """
+    将长文本切分为不超过max_chars字符的块：先按句子切分，过长的句子再按逗号和空白切开，
+    相邻的短句合并到同一块，减少合成调用次数
+
+    例如 chunk_text("第一句。第二句。", 4) -> ["第一句。", "第二句。"]
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        pieces.extend(_split_long(sentence, max_chars))
+    return [piece for piece in _merge(pieces, max_chars) if _WORD.search(piece)]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热门音频内存缓存
+最近播放的小文件保存在内存中，按总字节数LRU淘汰，重复播放不再读盘
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class HotClipCache:
+    """
+    参数:
+    - max_bytes: 缓存总字节数上限，0表示关闭
+    - max_item_bytes: 超过该大小的文件不缓存
+    """
+
+    def __init__(self, max_bytes, max_item_bytes=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def accepts(self, size):
+        return 0 < size <= self.max_item_bytes and size <= self.max_bytes
+
+    def get(self, name, etag):
+        """返回缓存的文件内容；内容哈希不一致（文件已被替换）时视为未命中"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, name, etag, data):
+        if not self.accepts(len(data)):
+            return
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self._total_bytes -= len(old[1])
+            self._entries[name] = (etag, data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步合成任务队列
+任务提交后立即返回任务ID，由有界工作线程池按优先级执行；
+排队任务数达到上限时拒绝新任务，调用方据此返回HTTP 429
+
+任务由提交它的进程执行；指定store时任务状态同时写入共享存储（输出索引的jobs表），
+多个工作进程共用一个监听端口时，查询请求落到任何一个进程都能查到任务
+"""
+
+import time
+import uuid
+import heapq
+import logging
+import threading
+import itertools
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+# 任务状态快照，写入共享存储和生成查询结果都使用它
+JobRecord = namedtuple('JobRecord', [
+    'id', 'status', 'priority', 'done', 'total', 'created', 'started', 'finished', 'result', 'error',
+])
+
+
+def describe(record, position=None):
+    """任务状态 -> 查询接口返回的字典"""
+    result = {
+        'id': record.id,
+        'status': record.status,
+        'priority': record.priority,
+        'progress': {'done': record.done, 'total': record.total},
+        'createdAt': record.created,
+        'startedAt': record.started,
+        'finishedAt': record.finished,
+    }
+    if record.status == SUCCEEDED and record.result:
+        result.update(record.result)
+    if record.status == FAILED:
+        result['error'] = record.error
+    if position is not None:
+        result['queuePosition'] = position
+    return result
+
+
+class QueueFullError(Exception):
+    """排队任务已满"""
+
+
+class Job:
+    """
+    一个异步任务
+
+    参数:
+    - fn: 任务函数 fn(job) -> 结果字典，可通过 job.set_progress 汇报进度
+    - priority: 优先级，数值越大越先执行
+    - on_change: 状态或进度变化时的回调 on_change(job)
+    """
+
+    def __init__(self, fn, priority=0, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.priority = priority
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.sort_key = None
+        self._on_change = on_change
+        self._lock = threading.Lock()
+
+    def set_progress(self, done, total):
+        """汇报进度：已完成片段数 / 片段总数"""
+        with self._lock:
+            self.done = done
+            self.total = total
+        self.changed()
+
+    def changed(self):
+        if self._on_change is not None:
+            self._on_change(self)
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def record(self):
+        with self._lock:
+            return JobRecord(self.id, self.status, self.priority, self.done, self.total,
+                             self.created_at, self.started_at, self.finished_at, self.result, self.error)
+
+
+class JobQueue:
+    """
+    优先级任务队列
+
+    参数:
+    - workers: 工作线程数
+    - max_pending: 最多排队（未开始）的任务数，超过后 submit 抛出 QueueFullError
+    - retention: 已完成任务的保留时间（秒），过期后无法再查询
+    - store: 共享任务存储（提供 save_job / load_job / job_counts / prune_jobs），为None时只保存在本进程内存中
+    """
+
+    def __init__(self, workers=2, max_pending=100, retention=3600, store=None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.store = store
+        self._heap = []
+        self._sequence = itertools.count()
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self.rejected = 0
+
+    def _start_workers(self):
+        """首次提交任务时才启动工作线程，多进程服务在fork之后各自启动（调用方需持有锁）"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'tts-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, priority=0):
+        """
+        提交任务
+
+        返回:
+        - Job
+        """
+        with self._condition:
+            if self._closed:
+                raise QueueFullError("服务正在关闭，不再接收新任务")
+            if len(self._heap) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"排队任务已达上限（{self.max_pending}）")
+            self._prune()
+            job = Job(fn, priority, on_change=self._save if self.store is not None else None)
+            job.sort_key = (-priority, next(self._sequence))
+            self._jobs[job.id] = job
+            # 先登记再入队，返回任务ID之前其他进程就能查到
+            self._save(job)
+            heapq.heappush(self._heap, job.sort_key + (job,))
+            self._start_workers()
+            self._condition.notify()
+        return job
+
+    def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            self.store.save_job(job.record())
+        except Exception as e:
+            logger.warning(f"任务 {job.id} 状态写入失败: {e}")
+
+    def status(self, job_id):
+        """
+        查询任务状态（describe 的返回值，排队中的任务带queuePosition），不存在或已过期时返回None
+        本进程的任务直接读内存，其他进程提交的任务从共享存储读取
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                position = None
+                if job.status == QUEUED:
+                    position = sum(1 for entry in self._heap if entry[:2] < job.sort_key)
+                return describe(job.record(), position)
+        if self.store is None:
+            return None
+        found = self.store.load_job(job_id)
+        if found is None:
+            return None
+        record, position = found
+        return describe(JobRecord(**record), position)
+
+    def _prune(self):
+        """清理过期的已完成任务（调用方需持有锁）"""
+        deadline = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < deadline]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self.store is not None:
+            try:
+                self.store.prune_jobs(deadline)
+            except Exception as e:
+                logger.warning(f"清理过期任务失败: {e}")
+
+    @property
+    def pending(self):
+        """本进程中排队（未开始）的任务数"""
+        with self._condition:
+            return len(self._heap)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap and not self._closed:
+                    self._condition.wait()
+                if not self._heap:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+                job.status = RUNNING
+                job.started_at = time.time()
+            job.changed()
+
+            try:
+                result = job.fn(job)
+            except Exception as e:
+                logger.error(f"任务 {job.id} 失败: {e}")
+                job.error = str(e)
+                job.finished_at = time.time()
+                job.status = FAILED
+            else:
+                job.result = result
+                job.finished_at = time.time()
+                job.status = SUCCEEDED
+            job.changed()
+
+    def stats(self):
+        """
+        任务统计；有共享存储时各状态的任务数为所有进程的合计，rejected / maxPending / workers 为本进程的值
+        """
+        with self._condition:
+            statuses = [job.status for job in self._jobs.values()]
+            counts = {
+                'queued': len(self._heap),
+                'running': statuses.count(RUNNING),
+                'succeeded': statuses.count(SUCCEEDED),
+                'failed': statuses.count(FAILED),
+            }
+        if self.store is not None:
+            try:
+                shared = self.store.job_counts()
+                counts = {status: shared.get(status, 0) for status in counts}
+            except Exception as e:
+                logger.warning(f"读取任务统计失败: {e}")
+        return {
+            **counts,
+            'rejected': self.rejected,
+            'maxPending': self.max_pending,
+            'workers': self.workers,
+        }
+
+    def close(self):
+        """
+        停止接收新任务，尚未开始的任务标记为失败；正在执行的任务继续完成
+        """
+        with self._condition:
+            self._closed = True
+            now = time.time()
+            cancelled = [job for _, _, job in self._heap]
+            for job in cancelled:
+                job.status = FAILED
+                job.error = '服务关闭，任务未执行'
+                job.finished_at = now
+            self._heap = []
+            self._condition.notify_all()
+        for job in cancelled:
+            job.changed()
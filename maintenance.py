@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出目录后台维护
+定期按最近访问时间淘汰输出文件，使输出目录不超过磁盘配额、长期未访问的文件被删除；
+每批只删除少量文件，批之间短暂停顿，不占用请求线程
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class OutputMaintenance:
+    """
+    输出目录维护任务
+
+    参数:
+    - store: OutputStore
+    - interval: 两次维护之间的间隔（秒）
+    - max_age: 超过该秒数未访问的文件被淘汰，None表示不限
+    - max_bytes: 输出目录总大小上限，None表示不限
+    - batch_size: 每批最多删除的文件数
+    - pause: 批之间的停顿（秒）
+    """
+
+    def __init__(self, store, interval=300, max_age=None, max_bytes=None, batch_size=200, pause=0.05):
+        self.store = store
+        self.interval = interval
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.pause = pause
+        self.runs = 0
+        self.evicted_files = 0
+        self.freed_bytes = 0
+        self.last_run = None
+        self.last_duration = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._requested_max_age = None
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """启动后台线程；fork出的子进程需要重新启动"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='output-maintenance', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+        logger.info(f"输出目录维护已启动: 每 {self.interval} 秒, 每批 {self.batch_size} 个文件")
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def trigger(self, max_age=None):
+        """
+        请求尽快执行一次维护，不等待完成
+        指定max_age时本次额外淘汰超过该秒数未访问的文件
+        """
+        if max_age is not None:
+            with self._lock:
+                if self._requested_max_age is None or max_age < self._requested_max_age:
+                    self._requested_max_age = max_age
+        self.start()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"输出目录维护失败: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_once(self):
+        """
+        分批淘汰直到满足配额和过期时间
+
+        返回:
+        - (删除的文件数, 释放的字节数)
+        """
+        with self._lock:
+            max_age = self.max_age
+            if self._requested_max_age is not None:
+                max_age = self._requested_max_age if max_age is None else min(max_age, self._requested_max_age)
+                self._requested_max_age = None
+        if max_age is None and self.max_bytes is None:
+            return 0, 0
+
+        started = time.time()
+        removed = freed = 0
+        while not self._stopping.is_set():
+            count, size = self.store.evict(max_age, self.max_bytes, limit=self.batch_size)
+            removed += count
+            freed += size
+            with self._lock:
+                self.evicted_files += count
+                self.freed_bytes += size
+            if count < self.batch_size:
+                break
+            self._stopping.wait(self.pause)
+
+        with self._lock:
+            self.runs += 1
+            self.last_run = started
+            self.last_duration = time.time() - started
+        if removed:
+            logger.info(f"输出目录维护: 淘汰 {removed} 个文件, 释放 {freed} 字节")
+        return removed, freed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'evictedFiles': self.evicted_files,
+                'freedBytes': self.freed_bytes,
+                'lastRun': self.last_run,
+                'lastDuration': round(self.last_duration, 3) if self.last_duration is not None else None,
+                'maxAge': self.max_age,
+                'maxBytes': self.max_bytes,
+            }
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+提供Prometheus文本格式的计数器、直方图和仪表，以及按阶段计时的上下文管理器
+设置环境变量 TTS_METRICS=0 可关闭，关闭后计时和计数都是空操作
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+ENABLED = os.environ.get('TTS_METRICS', '1') != '0'
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """单调递增计数器"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    """直方图：累计分桶计数、总和与次数"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        result = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                result.append((f"{self.name}_bucket", labels, cumulative))
+            result.append((f"{self.name}_sum", _format_labels(self.labelnames, key), total))
+            result.append((f"{self.name}_count", _format_labels(self.labelnames, key), count))
+        return result
+
+
+class Gauge:
+    """
+    仪表：在导出时调用函数读取当前值，由其他组件维护的计数也可以用metric_type='counter'导出
+    指定labelnames时函数返回 {标签值元组: 值}
+    """
+
+    def __init__(self, name, documentation, function, metric_type='gauge', labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.type = metric_type
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        if not self.labelnames:
+            return [(self.name, '', self.function())]
+        items = sorted(self.function().items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function, metric_type='gauge', labelnames=()):
+        return self.register(Gauge(name, documentation, function, metric_type, labelnames))
+
+    def render(self):
+        """导出为Prometheus文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'tts_stage_seconds', '各处理阶段耗时（秒）', labelnames=('stage',)
+)
+
+
+class RequestTiming:
+    """单个请求的分阶段耗时，工作线程也会写入，因此需要加锁"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def as_dict(self):
+        with self._lock:
+            result = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+            result.update(self.counters)
+        result['total'] = round((time.perf_counter() - self.started) * 1000, 2)
+        return result
+
+
+_current_timing = contextvars.ContextVar('tts_request_timing', default=None)
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_STAGE = _NoopStage()
+
+
+@contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.add(name, elapsed)
+
+
+def stage(name):
+    """
+    阶段计时上下文管理器：
+        with stage('tts'):
+            ...
+    指标关闭且当前请求未要求耗时明细时不做任何计时
+    """
+    if not ENABLED and _current_timing.get() is None:
+        return _NOOP_STAGE
+    return _timed_stage(name)
+
+
+def count(name, amount=1):
+    """在当前请求的耗时明细中累加一个计数（如片段数、缓存命中数）"""
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.count(name, amount)
+
+
+def start_request_timing():
+    """为当前请求开始记录分阶段耗时，返回用于恢复的token"""
+    return _current_timing.set(RequestTiming())
+
+
+def finish_request_timing(token):
+    """结束当前请求的记录，返回耗时明细（毫秒）"""
+    timing = _current_timing.get()
+    _current_timing.reset(token)
+    return timing.as_dict() if timing is not None else None
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3帧级拼接
+解析MPEG Layer III帧头，去掉每个文件自带的ID3/APE标签和Xing/Info/VBRI信息帧，
+格式相同的多段MP3直接按帧首尾相接，最后只写一个Info/Xing头，不需要解码和重新编码
+片段之间的停顿用静音帧（边信息全为0的帧）填充
+
+输入带LAME标签时，输出的LAME标签记录第一段的编码器延迟和最后一段的末尾填充，开头和结尾不会多出静音；
+中间每个接缝处仍保留前一段的末尾填充和后一段的编码器延迟（几十毫秒），去掉它们需要解码，因此不是无缝拼接
+"""
+
+from collections import namedtuple
+
+# MPEG版本位 -> 采样率表（00=MPEG2.5, 10=MPEG2, 11=MPEG1）
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+# Layer III 码率表（kbps），下标为码率索引，0（free）和15（无效）不支持
+_BITRATES_MPEG1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_BITRATES_MPEG2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+# gTTS输出的帧头：MPEG2 Layer III, 32kbps, 24kHz, 单声道, 无CRC
+GTTS_HEADER = 0xFFF344C4
+
+# Xing/Info头的标志位：帧数、字节数、TOC、质量
+_XING_FRAMES, _XING_BYTES, _XING_TOC, _XING_QUALITY = 1, 2, 4, 8
+# LAME标签长度，以及其中编码器延迟/末尾填充（各12位）所在的偏移
+_LAME_SIZE = 36
+_LAME_DELAY = 21
+
+Mp3Format = namedtuple('Mp3Format', ['version', 'sample_rate', 'mono'])
+
+
+class Mp3FormatError(ValueError):
+    """数据不是可以按帧拼接的MP3"""
+
+
+class _Header(namedtuple('_Header', ['value', 'format', 'bitrate_index', 'length', 'side_info'])):
+    """解析后的帧头"""
+
+    @property
+    def samples(self):
+        return 1152 if self.format.version == 3 else 576
+
+
+def _parse_header(value):
+    """解析4字节帧头，不是有效的Layer III帧头时返回None"""
+    if (value >> 21) & 0x7FF != 0x7FF:
+        return None
+    version = (value >> 19) & 3
+    layer = (value >> 17) & 3
+    bitrate_index = (value >> 12) & 0xF
+    rate_index = (value >> 10) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (value >> 9) & 1
+    mono = (value >> 6) & 3 == 3
+    crc = 0 if (value >> 16) & 1 else 2
+    if version == 3:
+        length = 144000 * _BITRATES_MPEG1[bitrate_index] // sample_rate + padding
+        side_info = (17 if mono else 32) + crc
+    else:
+        length = 72000 * _BITRATES_MPEG2[bitrate_index] // sample_rate + padding
+        side_info = (9 if mono else 17) + crc
+    return _Header(value, Mp3Format(version, sample_rate, mono), bitrate_index, length, side_info)
+
+
+def _header_at(data, offset):
+    if offset + 4 > len(data):
+        return None
+    return _parse_header(int.from_bytes(data[offset:offset + 4], 'big'))
+
+
+def _strip_tags(data):
+    """返回去掉开头的ID3v2标签和结尾的ID3v1/APEv2标签后的 (起始位置, 结束位置)"""
+    start, end = 0, len(data)
+    while end - start >= 10 and data[start:start + 3] == b'ID3':
+        size = 0
+        for byte in data[start + 6:start + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if data[start + 5] & 0x10 else 0
+        start += 10 + size + footer
+    while True:
+        if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+            end -= 128
+        elif end - start >= 32 and data[end - 32:end - 24] == b'APETAGEX':
+            size = int.from_bytes(data[end - 20:end - 16], 'little')
+            has_header = data[end - 9] & 0x80
+            end -= size + (32 if has_header else 0)
+        else:
+            return start, max(start, end)
+
+
+def _is_info_frame(data, offset, header):
+    """Xing/Info/VBRI信息帧不含音频，拼接时去掉"""
+    tag = offset + 4 + header.side_info
+    return data[tag:tag + 4] in (b'Xing', b'Info') or data[offset + 36:offset + 40] == b'VBRI'
+
+
+def _lame_tag(data, offset, header):
+    """返回Xing/Info帧中的LAME标签（36字节），没有时返回None"""
+    tag = offset + 4 + header.side_info
+    if data[tag:tag + 4] not in (b'Xing', b'Info'):
+        return None
+    flags = int.from_bytes(data[tag + 4:tag + 8], 'big')
+    position = tag + 8
+    position += 4 * bool(flags & _XING_FRAMES) + 4 * bool(flags & _XING_BYTES)
+    position += 100 * bool(flags & _XING_TOC) + 4 * bool(flags & _XING_QUALITY)
+    lame = data[position:position + _LAME_SIZE]
+    # ffmpeg编码的文件版本串为Lavc/Lavf，格式与LAME相同
+    if len(lame) < _LAME_SIZE or lame[:4] not in (b'LAME', b'Lavc', b'Lavf'):
+        return None
+    return bytes(lame)
+
+
+def _crc16(data):
+    """LAME标签使用的CRC-16（多项式0x8005，按位反转）"""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+class Mp3Frames:
+    """
+    去掉标签和信息帧后的纯音频帧
+
+    属性:
+    - format: Mp3Format
+    - header: 第一个音频帧的帧头，用于生成相同格式的静音帧和信息帧
+    - data: 首尾相接的帧数据
+    - sizes: 每一帧的字节数
+    - lame: 输入文件的LAME标签（36字节），没有时为None
+    - padding: 末尾填充的采样数，未知时为None
+    """
+
+    def __init__(self, header, data, sizes, lame=None, padding=None):
+        self.header = header
+        self.data = data
+        self.sizes = sizes
+        self.lame = lame
+        self.padding = padding
+
+    @property
+    def format(self):
+        return self.header.format
+
+    @property
+    def frame_count(self):
+        return len(self.sizes)
+
+
+def parse_frames(data):
+    """
+    解析MP3数据，返回其中的音频帧
+
+    遇到帧之间的杂散字节时向后查找下一个格式相同的帧头；结尾不完整的帧丢弃
+
+    异常:
+    - Mp3FormatError: 找不到有效的Layer III帧
+    """
+    position, end = _strip_tags(data)
+    first = None
+    lame = None
+    runs = []
+    sizes = []
+    while position + 4 <= end:
+        header = _header_at(data, position)
+        if header is None or (first is not None and header.format != first.format):
+            position = _find_sync(data, position + 1, end, first.format if first else None)
+            if position is None:
+                break
+            continue
+        if position + header.length > end:
+            break
+        if first is None:
+            # 第一个帧头后面需要紧跟一个格式相同的帧头（或正好到结尾），避免把杂散字节当作帧头
+            following = _header_at(data, position + header.length)
+            if position + header.length < end and (following is None or following.format != header.format):
+                position += 1
+                continue
+            if _is_info_frame(data, position, header):
+                lame = _lame_tag(data, position, header)
+                position += header.length
+                continue
+            first = header
+        if runs and runs[-1][1] == position:
+            runs[-1][1] = position + header.length
+        else:
+            runs.append([position, position + header.length])
+        sizes.append(header.length)
+        position += header.length
+
+    if first is None:
+        raise Mp3FormatError('没有找到有效的MP3音频帧')
+    view = memoryview(data)
+    padding = int.from_bytes(lame[_LAME_DELAY:_LAME_DELAY + 3], 'big') & 0xFFF if lame else None
+    return Mp3Frames(first, b''.join(view[start:stop] for start, stop in runs), sizes, lame, padding)
+
+
+def _find_sync(data, position, end, audio_format=None):
+    """从position开始查找下一个有效帧头（指定audio_format时要求格式相同）"""
+    while True:
+        position = data.find(b'\xff', position, end - 3)
+        if position < 0:
+            return None
+        header = _header_at(data, position)
+        if header is not None and (audio_format is None or header.format == audio_format):
+            return position
+        position += 1
+
+
+def _make_header(template, bitrate_index=None):
+    """以template为模板生成帧头：不带CRC、无填充，可选更换码率"""
+    value = (template.value | 0x10000) & ~0x200
+    if bitrate_index is not None:
+        value = (value & ~0xF000) | (bitrate_index << 12)
+    return _parse_header(value)
+
+
+def silent_frames(duration_ms, header=GTTS_HEADER):
+    """
+    指定时长的静音帧（不含文件头）
+
+    参数:
+    - duration_ms: 时长（毫秒），按帧长取整
+    - header: 帧头模板（_Header或4字节整数），静音帧与之格式、码率相同
+    """
+    if not isinstance(header, _Header):
+        header = _parse_header(header)
+    frame_header = _make_header(header)
+    count = int(duration_ms * frame_header.format.sample_rate / 1000 / frame_header.samples + 0.5)
+    if duration_ms > 0:
+        count = max(1, count)
+    frame = frame_header.value.to_bytes(4, 'big') + bytes(frame_header.length - 4)
+    return frame * count
+
+
+def join_frames(items, gap_ms=0):
+    """
+    按顺序拼接多段音频帧，相邻两段之间插入gap_ms毫秒的静音帧
+    结果沿用第一段的LAME标签（编码器延迟）和最后一段的末尾填充
+
+    参数:
+    - items: Mp3Frames列表
+
+    异常:
+    - Mp3FormatError: 各段的MPEG版本、采样率或声道数不一致
+    """
+    if not items:
+        raise Mp3FormatError('没有可拼接的音频')
+    first = items[0]
+    for item in items[1:]:
+        if item.format != first.format:
+            raise Mp3FormatError(f'音频格式不一致: {first.format} != {item.format}')
+    gap = silent_frames(gap_ms, first.header) if gap_ms > 0 else b''
+    frame_length = _make_header(first.header).length
+    gap_sizes = [frame_length] * (len(gap) // frame_length)
+
+    pieces = []
+    sizes = []
+    for i, item in enumerate(items):
+        if i > 0 and gap:
+            pieces.append(gap)
+            sizes.extend(gap_sizes)
+        pieces.append(item.data)
+        sizes.extend(item.sizes)
+    return Mp3Frames(first.header, b''.join(pieces), sizes, first.lame, items[-1].padding)
+
+
+def _info_frame(frames):
+    """
+    生成描述整个文件的信息帧：码率恒定时写Info头，否则写带TOC的Xing头（便于播放器计算时长和拖动）
+    第一段带LAME标签时一并写入，记录第一段的编码器延迟和最后一段的末尾填充，解码时据此裁掉开头和结尾的多余采样
+    """
+    # 码率恒定时各帧长度只因填充位相差1字节
+    cbr = max(frames.sizes) - min(frames.sizes) <= 1
+    lame = frames.lame
+    template = frames.header
+    # 写LAME标签时按LAME的布局写出全部字段，部分解析器按固定偏移查找LAME标签
+    flags = _XING_FRAMES | _XING_BYTES
+    if not cbr or lame:
+        flags |= _XING_TOC
+    if lame:
+        flags |= _XING_QUALITY
+    payload_size = 16 + 100 * bool(flags & _XING_TOC) + 4 * bool(flags & _XING_QUALITY) + _LAME_SIZE * bool(lame)
+    header = _make_header(template)
+    if header.length < 4 + header.side_info + payload_size:
+        table = _BITRATES_MPEG1 if template.format.version == 3 else _BITRATES_MPEG2
+        for index in range(1, len(table)):
+            header = _make_header(template, index)
+            if header.length >= 4 + header.side_info + payload_size:
+                break
+    total_bytes = header.length + len(frames.data)
+
+    frame = bytearray(header.length)
+    frame[0:4] = header.value.to_bytes(4, 'big')
+    tag = 4 + header.side_info
+    frame[tag:tag + 4] = b'Info' if cbr else b'Xing'
+    frame[tag + 4:tag + 8] = flags.to_bytes(4, 'big')
+    frame[tag + 8:tag + 12] = frames.frame_count.to_bytes(4, 'big')
+    frame[tag + 12:tag + 16] = total_bytes.to_bytes(4, 'big')
+    position = tag + 16
+    if flags & _XING_TOC:
+        # TOC: 第i项为播放到i%处的字节位置占文件总长的比例（0~255）
+        offsets = []
+        offset = header.length
+        for size in frames.sizes:
+            offsets.append(offset)
+            offset += size
+        for i in range(100):
+            offset = offsets[min(len(offsets) - 1, i * len(offsets) // 100)]
+            frame[position + i] = min(255, offset * 256 // total_bytes)
+        position += 100
+    if flags & _XING_QUALITY:
+        position += 4
+    if lame:
+        lame = bytearray(lame)
+        # 回放增益只适用于第一段，清零
+        lame[11:19] = bytes(8)
+        delay = int.from_bytes(lame[_LAME_DELAY:_LAME_DELAY + 3], 'big') >> 12
+        lame[_LAME_DELAY:_LAME_DELAY + 3] = ((delay << 12) | (frames.padding or 0)).to_bytes(3, 'big')
+        # 音乐长度为整个文件的字节数；音乐CRC需要遍历全部音频帧，写0表示未计算
+        lame[28:32] = total_bytes.to_bytes(4, 'big')
+        lame[32:34] = bytes(2)
+        frame[position:position + 34] = lame[:34]
+        # 标签CRC覆盖帧头到标签CRC之前的全部字节
+        frame[position + 34:position + 36] = _crc16(frame[:position + 34]).to_bytes(2, 'big')
+    return bytes(frame)
+
+
+def to_mp3(frames):
+    """在音频帧前加上一个信息帧，得到完整的MP3文件"""
+    return _info_frame(frames) + frames.data
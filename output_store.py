@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出音频索引
+用SQLite记录每个输出文件：对外文件名 -> 分目录存放的路径、结果键、文本、语速、大小、创建和最近访问时间
+查找已有结果、分配文件名、存在性检查和按时间/大小淘汰都是索引查询，不再扫描目录
+
+文件按文件名哈希的前两位分目录存放（output/ab/名称.mp3），对外地址仍为 /output/名称.mp3
+被淘汰的文件名不会再分配给其他内容，因此同一地址的内容始终不变，可以长期缓存
+
+异步任务的状态也记录在同一个索引中（jobs表），多个工作进程都能查询
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = '.index.sqlite3'
+LEGACY_INDEX_NAME = '.results.json'
+# 最近访问时间的记录间隔（秒）：读多写少，命中时不必每次都写索引
+ACCESS_INTERVAL = 60
+
+# 单个输出文件的信息：实际路径、内容哈希（ETag）、大小、创建时间
+ClipInfo = namedtuple('ClipInfo', ['path', 'etag', 'size', 'created'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    key TEXT,
+    text TEXT,
+    speed INTEGER,
+    size INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    -- 0 已预留（合成中），1 已完成，2 已淘汰（保留记录使文件名不被复用）
+    ready INTEGER NOT NULL DEFAULT 1,
+    etag TEXT
+);
+CREATE INDEX IF NOT EXISTS clips_key ON clips(key);
+CREATE INDEX IF NOT EXISTS clips_accessed ON clips(accessed);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    -- 执行任务的进程ID，排队位置只与同一进程的任务比较
+    owner INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(finished);
+"""
+
+_JOB_COLUMNS = ('id', 'status', 'priority', 'done', 'total', 'created', 'started', 'finished', 'result', 'error')
+
+
+def file_digest(path):
+    """文件内容的SHA-256，用作ETag"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shard_path(name):
+    """文件名对应的分目录相对路径"""
+    shard = hashlib.md5(name.encode('utf-8')).hexdigest()[:2]
+    return f"{shard}/{name}"
+
+
+class OutputStore:
+    """
+    输出目录及其索引
+
+    参数:
+    - output_dir: 输出目录，索引文件保存在其中
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.index_path = self.output_dir / INDEX_NAME
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        """
+        每个线程使用各自的连接；fork出的子进程重新连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.index_path), timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        with self._init_lock:
+            if not self._initialized:
+                self._initialize(conn)
+                self._initialized = True
+        return conn
+
+    def _initialize(self, conn):
+        """建表；新建索引时导入旧版本平铺在输出目录中的文件"""
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(clips)')}
+        if 'etag' not in columns:
+            conn.execute('ALTER TABLE clips ADD COLUMN etag TEXT')
+        # 上次运行中断时留下的预留记录
+        conn.execute('DELETE FROM clips WHERE ready = 0 AND created < ?', (time.time() - 3600,))
+        if conn.execute('SELECT 1 FROM clips LIMIT 1').fetchone() is None:
+            self._import_legacy(conn)
+
+    def _import_legacy(self, conn):
+        """导入旧版本的平铺文件和JSON结果索引，文件保留在原位置"""
+        keys = {}
+        legacy_index = self.output_dir / LEGACY_INDEX_NAME
+        if legacy_index.exists():
+            try:
+                with open(legacy_index, 'r', encoding='utf-8') as f:
+                    keys = {filename: key for key, filename in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                logger.warning(f"旧结果索引读取失败: {e}")
+
+        rows = []
+        for entry in os.scandir(self.output_dir):
+            if entry.is_file() and entry.name.endswith('.mp3'):
+                stat = entry.stat()
+                rows.append((entry.name, entry.name, keys.get(entry.name), stat.st_size, stat.st_mtime, stat.st_mtime))
+        if rows:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT OR IGNORE INTO clips (name, path, key, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+            conn.execute('COMMIT')
+            logger.info(f"已将 {len(rows)} 个旧输出文件导入索引")
+
+    def path_for(self, relative_path):
+        return self.output_dir / relative_path
+
+    def lookup(self, key, min_interval=ACCESS_INTERVAL):
+        """
+        查询结果键对应的文件名，并更新最近访问时间（与touch相同，距上次记录不足min_interval秒时不写索引）
+        文件已被外部删除时清除该记录并返回None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT name, path, accessed FROM clips WHERE key = ? AND ready = 1 ORDER BY created DESC LIMIT 1', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        name, path, accessed = row
+        if not self.path_for(path).exists():
+            conn.execute('UPDATE clips SET ready = 2 WHERE name = ?', (name,))
+            return None
+        now = time.time()
+        if now - accessed >= min_interval:
+            conn.execute('UPDATE clips SET accessed = ? WHERE name = ?', (now, name))
+        return name
+
+    def describe(self, name):
+        """
+        返回已完成文件的ClipInfo，不存在时返回None
+        旧版本导入的文件在第一次访问时计算ETag
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT path, etag, size, created FROM clips WHERE name = ? AND ready = 1', (name,)
+        ).fetchone()
+        if row is None:
+            return None
+        path, etag, size, created = row
+        if etag is None:
+            try:
+                etag = file_digest(self.path_for(path))
+            except FileNotFoundError:
+                return None
+            conn.execute('UPDATE clips SET etag = ? WHERE name = ?', (etag, name))
+        return ClipInfo(self.path_for(path), etag, size, created)
+
+    def reserve(self, base_name):
+        """
+        预留一个未被占用的文件名：base_name.mp3，已被占用时依次尝试 base_name_1.mp3 ...
+        一次索引查询取出全部同名前缀的文件名，不逐个探测文件
+
+        返回:
+        - (文件名, 实际路径)
+        """
+        conn = self._connect()
+        pattern = base_name.replace('[', '[[]').replace('*', '[*]').replace('?', '[?]')
+        while True:
+            taken = {row[0] for row in conn.execute(
+                'SELECT name FROM clips WHERE name = ? OR name GLOB ?', (f"{base_name}.mp3", f"{pattern}_*.mp3")
+            )}
+            name = f"{base_name}.mp3"
+            counter = 1
+            while name in taken:
+                name = f"{base_name}_{counter}.mp3"
+                counter += 1
+
+            path = shard_path(name)
+            now = time.time()
+            try:
+                conn.execute(
+                    'INSERT INTO clips (name, path, created, accessed, ready) VALUES (?, ?, ?, ?, 0)',
+                    (name, path, now, now),
+                )
+            except sqlite3.IntegrityError:
+                # 并发请求抢先占用了该名称，重新查询
+                continue
+            output_path = self.path_for(path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            return name, output_path
+
+    def commit(self, name, key, text=None, speed=None):
+        """reserve 预留的文件写入完成后登记"""
+        path = shard_path(name)
+        output_path = self.path_for(path)
+        size = output_path.stat().st_size
+        etag = file_digest(output_path)
+        now = time.time()
+        self._connect().execute(
+            'INSERT OR REPLACE INTO clips (name, path, key, text, speed, size, created, accessed, ready, etag) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)',
+            (name, path, key, text, speed, size, now, now, etag),
+        )
+
+    def release(self, name):
+        """合成失败时释放预留的文件名"""
+        self._connect().execute('DELETE FROM clips WHERE name = ? AND ready = 0', (name,))
+
+    def names(self):
+        """所有已完成的文件名"""
+        return {row[0] for row in self._connect().execute('SELECT name FROM clips WHERE ready = 1')}
+
+    def touch(self, name, min_interval=ACCESS_INTERVAL):
+        """
+        记录一次访问；距上次记录不足min_interval秒时不更新，避免每次请求都写索引
+        先读后写：写语句即使没有更新任何行也要获取写锁，多个进程之间会互相等待
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT accessed FROM clips WHERE name = ?', (name,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[0] >= min_interval:
+            conn.execute('UPDATE clips SET accessed = ? WHERE name = ?', (now, name))
+
+    def evict(self, max_age=None, max_bytes=None, limit=None):
+        """
+        按最近访问时间淘汰：先删除超过max_age秒未访问的文件，再从最久未访问的开始删除直到总大小不超过max_bytes
+        指定limit时本次最多删除limit个文件，供后台任务分批执行
+
+        返回:
+        - (删除的文件数, 释放的字节数)
+        """
+        conn = self._connect()
+        limit = -1 if limit is None else limit
+        victims = []
+        if max_age is not None:
+            victims.extend(conn.execute(
+                'SELECT name, path, size FROM clips WHERE ready = 1 AND accessed < ? ORDER BY accessed LIMIT ?',
+                (time.time() - max_age, limit),
+            ).fetchall())
+        if max_bytes is not None and (limit < 0 or len(victims) < limit):
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM clips WHERE ready = 1').fetchone()[0]
+            total -= sum(size for _, _, size in victims)
+            chosen = {name for name, _, _ in victims}
+            if total > max_bytes:
+                for name, path, size in conn.execute(
+                    'SELECT name, path, size FROM clips WHERE ready = 1 ORDER BY accessed LIMIT ?', (limit,)
+                ).fetchall():
+                    if total <= max_bytes or len(victims) == limit:
+                        break
+                    if name in chosen:
+                        continue
+                    victims.append((name, path, size))
+                    total -= size
+        return self._remove(conn, victims)
+
+    def _remove(self, conn, victims):
+        removed = freed = 0
+        for name, path, size in victims:
+            try:
+                self.path_for(path).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除输出文件失败 {path}: {e}")
+                continue
+            # 多个工作进程可能同时淘汰同一个文件，只统计更新了记录的一方
+            if conn.execute('UPDATE clips SET ready = 2 WHERE name = ? AND ready = 1', (name,)).rowcount:
+                removed += 1
+                freed += size
+        return removed, freed
+
+    def save_job(self, record):
+        """
+        写入异步任务的状态（job_queue.JobRecord），由执行任务的进程调用
+        """
+        values = record._asdict()
+        values['owner'] = os.getpid()
+        values['result'] = json.dumps(values['result'], ensure_ascii=False) if values['result'] is not None else None
+        self._connect().execute(
+            'INSERT OR REPLACE INTO jobs (owner, ' + ', '.join(_JOB_COLUMNS) + ') '
+            'VALUES (:owner, ' + ', '.join(f':{column}' for column in _JOB_COLUMNS) + ')',
+            values,
+        )
+
+    def load_job(self, job_id):
+        """
+        读取异步任务的状态
+
+        返回:
+        - (字段字典, 排队位置) 元组，排队位置为同一进程中排在它前面的任务数，不在排队中时为None
+        - 任务不存在时返回None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT owner, ' + ', '.join(_JOB_COLUMNS) + ' FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        owner = row[0]
+        record = dict(zip(_JOB_COLUMNS, row[1:]))
+        if record['result'] is not None:
+            record['result'] = json.loads(record['result'])
+        position = None
+        if record['status'] == 'queued':
+            position = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE owner = ? AND status = 'queued' AND id != ? "
+                "AND (priority > ? OR (priority = ? AND created < ?))",
+                (owner, job_id, record['priority'], record['priority'], record['created']),
+            ).fetchone()[0]
+        return record, position
+
+    def job_counts(self):
+        """所有进程的异步任务按状态计数"""
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+
+    def prune_jobs(self, before):
+        """删除在before之前完成的任务"""
+        self._connect().execute('DELETE FROM jobs WHERE finished < ?', (before,))
+
+    def stats(self):
+        count, total = self._connect().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips WHERE ready = 1'
+        ).fetchone()
+        return {'files': count, 'bytes': total}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -1,134 +1,169 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+读取词表，为E~I列缺失的音频批量生成文件
+词表逐行读取（xlsx只读模式 / csv / parquet），只取需要的列，不载入整张表
+"""
 
-import pandas as pd
 import requests
 import json
+import math
 import os
+import argparse
 
-def read_excel_data():
-    """读取Excel文件的所有行数据"""
+from bulk_pipeline import (
+    AudioJob, Checkpoint, HttpSynthesizer, InProcessSynthesizer, SkipCounter,
+    filter_jobs, list_existing_files, run_jobs,
+)
+from sheet_reader import count_rows, iter_rows
+
+EXCEL_PATH = os.environ.get('TTS_EXCEL_PATH', '音频缺少数据_cleaned.xlsx')
+OUTPUT_DIR = os.environ.get('TTS_OUTPUT_DIR', 'output')
+API_URL = os.environ.get('TTS_API_URL', "http://localhost:8080/api/synthesize")
+
+# 组合模式下重复单词之间的停顿（毫秒）
+COMPOSE_GAP_MS = 300
+
+# C列单词，J列中文，E~I列为已有音频
+SHEET_COLUMNS = ['C', 'J', 'E', 'F', 'G', 'H', 'I']
+
+def iter_sheet_rows(path):
+    """
+    逐行读取词表，跳过单词或中文为空的行
+    
+    返回:
+    - 生成器，依次产出 (行号, 单词, 中文, E空, F空, G空, H空, I空)
+    """
+    for row_number, (word, chinese, e, f, g, h, i) in iter_rows(path, SHEET_COLUMNS):
+        if is_empty(word) or is_empty(chinese):
+            continue
+        yield (row_number, word, chinese,
+               is_empty(e), is_empty(f), is_empty(g), is_empty(h), is_empty(i))
+
+def is_empty(value):
+    """判断单元格是否为空"""
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return str(value).strip() == ''
+
+def read_excel_data(path=EXCEL_PATH, output_dir=OUTPUT_DIR, api_url=API_URL):
+    """逐行读取词表并依次生成音频"""
     try:
-        # 读取Excel文件
-        df = pd.read_excel('/Users/lizhuang/Desktop/Model/text-to-speech/音频缺少数据_cleaned.xlsx')
-        
-        print("Excel文件列名:")
-        print(df.columns.tolist())
-        print(f"\n总共有 {len(df)} 行数据")
-        
-        # 显示所有行的C、E、F、G、H、I、J列
-        columns_to_check = ['C', 'E', 'F', 'G', 'H', 'I', 'J']
-        
-        # 如果列名不是字母，尝试使用索引
-        if 'C' not in df.columns:
-            # 使用列索引 (C=2, E=4, F=5, G=6, H=7, I=8, J=9)
-            df_subset = df.iloc[:, [2, 4, 5, 6, 7, 8, 9]]
-            df_subset.columns = ['C', 'E', 'F', 'G', 'H', 'I', 'J']
-        else:
-            df_subset = df[columns_to_check]
-        
-        # 检查E到I列的空值
         print("\n开始处理所有行数据...")
         generated_count = 0
         skipped_count = 0
+        # 一次查询输出索引得到已有文件，代替逐个文件检查
+        existing = list_existing_files(output_dir)
         
-        for index, row in df_subset.iterrows():
-            word = row['C']  # 英文单词
-            chinese = row['J']  # 中文
-            
-            # 跳过空的单词或中文
-            if pd.isna(word) or pd.isna(chinese) or str(word).strip() == '' or str(chinese).strip() == '':
-                continue
-                
-            print(f"\n第{index+1}行 - 单词: {word}, 中文: {chinese}")
-            
-            # 检查各列是否为空
-            e_empty = pd.isna(row['E']) or str(row['E']).strip() == ''
-            f_empty = pd.isna(row['F']) or str(row['F']).strip() == ''
-            g_empty = pd.isna(row['G']) or str(row['G']).strip() == ''
-            h_empty = pd.isna(row['H']) or str(row['H']).strip() == ''
-            i_empty = pd.isna(row['I']) or str(row['I']).strip() == ''
-            
+        for row_number, word, chinese, e_empty, f_empty, g_empty, h_empty, i_empty in iter_sheet_rows(path):
+            print(f"\n第{row_number}行 - 单词: {word}, 中文: {chinese}")
             print(f"  E列空: {e_empty}, F列空: {f_empty}, G列空: {g_empty}, H列空: {h_empty}, I列空: {i_empty}")
             
             # 生成需要的音频文件
-            gen_count, skip_count = generate_audio_files(word, chinese, e_empty, f_empty, g_empty, h_empty, i_empty)
-            generated_count += gen_count
-            skipped_count += skip_count
+            for job in plan_row_jobs(row_number, word, chinese, e_empty, f_empty, g_empty, h_empty, i_empty):
+                gen, skip = generate_audio(api_url, job.text, job.filename, output_dir, job.parts, existing=existing)
+                generated_count += gen
+                skipped_count += skip
         
         print(f"\n处理完成！共生成 {generated_count} 个新文件，跳过 {skipped_count} 个已存在文件。")
-        return df_subset
+        return generated_count, skipped_count
         
     except Exception as e:
-        print(f"读取Excel文件出错: {e}")
+        print(f"读取词表出错: {e}")
         return None
 
-def generate_audio_files(word, chinese, e_empty, f_empty, g_empty, h_empty, i_empty):
-    """根据空值情况生成对应的音频文件"""
-    base_url = "http://localhost:8080/api/synthesize"
-    output_dir = "/Users/lizhuang/Desktop/Model/text-to-speech/output"
-    generated_count = 0
-    skipped_count = 0
+def plan_row_jobs(row_number, word, chinese, e_empty, f_empty, g_empty, h_empty, i_empty):
+    """
+    根据空值情况列出一行需要生成的音频任务
+    F~I列是单词和中文的重复组合，使用组合模式：服务器对单词和中文各合成一次再拼接
+    """
+    word = str(word)
+    chinese = str(chinese)
     
     # 清理文件名中的特殊字符
-    clean_word = sanitize_filename(str(word))
-    clean_chinese = sanitize_filename(str(chinese))
+    clean_word = sanitize_filename(word)
+    clean_chinese = sanitize_filename(chinese)
+    
+    jobs = []
     
     # E列：英文
     if e_empty:
-        text = word
-        filename = f"{clean_word}.mp3"
-        gen, skip = generate_audio(base_url, text, filename, output_dir)
-        generated_count += gen
-        skipped_count += skip
+        jobs.append(AudioJob(row_number, 'E', word, f"{clean_word}.mp3"))
     
     # F列：两次英文
     if f_empty:
-        text = f"{word}{word}"
-        filename = f"{clean_word}{clean_word}.mp3"
-        gen, skip = generate_audio(base_url, text, filename, output_dir)
-        generated_count += gen
-        skipped_count += skip
+        jobs.append(AudioJob(row_number, 'F', f"{word}{word}", f"{clean_word}{clean_word}.mp3",
+                             (word, word)))
     
     # G列：一英一中
     if g_empty:
-        text = f"{word}{chinese}"
-        filename = f"{clean_word}{clean_chinese}.mp3"
-        gen, skip = generate_audio(base_url, text, filename, output_dir)
-        generated_count += gen
-        skipped_count += skip
+        jobs.append(AudioJob(row_number, 'G', f"{word}{chinese}", f"{clean_word}{clean_chinese}.mp3",
+                             (word, chinese)))
     
     # H列：两英一中
     if h_empty:
-        text = f"{word}{word}{chinese}"
-        filename = f"{clean_word}{clean_word}{clean_chinese}.mp3"
-        gen, skip = generate_audio(base_url, text, filename, output_dir)
-        generated_count += gen
-        skipped_count += skip
+        jobs.append(AudioJob(row_number, 'H', f"{word}{word}{chinese}", f"{clean_word}{clean_word}{clean_chinese}.mp3",
+                             (word, word, chinese)))
     
     # I列：三次英文
     if i_empty:
-        text = f"{word}{word}{word}"
-        filename = f"{clean_word}{clean_word}{clean_word}.mp3"
-        gen, skip = generate_audio(base_url, text, filename, output_dir)
-        generated_count += gen
-        skipped_count += skip
+        jobs.append(AudioJob(row_number, 'I', f"{word}{word}{word}", f"{clean_word}{clean_word}{clean_word}.mp3",
+                             (word, word, word)))
     
-    return generated_count, skipped_count
+    return jobs
+
+def plan_all_jobs(rows):
+    """逐行列出需要生成的音频任务，rows 为 iter_sheet_rows 的输出"""
+    for row in rows:
+        yield from plan_row_jobs(*row)
 
-def generate_audio(base_url, text, filename, output_dir):
-    """调用API生成音频文件"""
+def run_bulk(path=EXCEL_PATH, output_dir=OUTPUT_DIR, api_url=API_URL, workers=8, in_process=False,
+             retries=3, checkpoint_path=None, gap_ms=COMPOSE_GAP_MS):
+    """
+    批量模式：边读表格边生成任务，跳过已存在/已完成的文件，并发生成
+    """
+    # 只查询一次输出索引，代替逐个文件检查
+    existing = list_existing_files(output_dir)
+    checkpoint = Checkpoint(checkpoint_path)
+    skipped = SkipCounter()
+    jobs = filter_jobs(plan_all_jobs(iter_sheet_rows(path)), existing, checkpoint, skipped)
+    
+    if in_process:
+        synthesize = InProcessSynthesizer(output_dir, gap_ms=gap_ms)
+    else:
+        synthesize = HttpSynthesizer(api_url, pool_size=workers, gap_ms=gap_ms)
+    
+    try:
+        generated, failures = run_jobs(jobs, synthesize, workers=workers, retries=retries, checkpoint=checkpoint,
+                                       total_rows=count_rows(path))
+    finally:
+        synthesize.close()
+        checkpoint.close()
+    
+    print(f"\n处理完成！共生成 {generated} 个新文件，跳过 {skipped.count} 个已存在或已完成的文件，失败 {len(failures)} 个。")
+    return generated, failures
+
+def generate_audio(base_url, text, filename, output_dir, parts=None, gap_ms=COMPOSE_GAP_MS, existing=None):
+    """调用API生成音频文件，existing 为预先列出的已有文件名集合"""
     try:
         # 检查文件是否已存在
-        file_path = os.path.join(output_dir, filename)
-        if os.path.exists(file_path):
+        if existing is None:
+            existing = list_existing_files(output_dir)
+        if filename in existing:
             print(f"  跳过已存在文件: {filename}")
             return 0, 1  # 0个生成，1个跳过
         
         data = {
             "text": text,
-            "speed": 2  # 正常语速
+            "speed": 2,  # 正常语速
+            "filename": filename
         }
+        if parts:
+            # 组合模式：重复部分只合成一次
+            data["parts"] = list(parts)
+            data["gapMs"] = gap_ms
         
         print(f"  生成音频: {filename} - 文本: {text}")
         
@@ -160,7 +195,25 @@ def sanitize_filename(text):
     filename = filename.strip()
     return filename
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='读取Excel并批量生成音频')
+    parser.add_argument('path', nargs='?', default=EXCEL_PATH, help='词表路径（xlsx / csv / parquet）')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='音频输出目录')
+    parser.add_argument('--api-url', default=API_URL, help='合成接口地址')
+    parser.add_argument('--bulk', action='store_true', help='使用并发批量模式')
+    parser.add_argument('--workers', type=int, default=8, help='批量模式并发数')
+    parser.add_argument('--in-process', action='store_true', help='在当前进程内直接合成，不经过HTTP接口')
+    parser.add_argument('--retries', type=int, default=3, help='失败重试次数')
+    parser.add_argument('--checkpoint', default='bulk_checkpoint.txt', help='断点续跑记录文件')
+    parser.add_argument('--gap-ms', type=int, default=COMPOSE_GAP_MS, help='组合模式中重复部分之间的停顿（毫秒）')
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     print("开始读取Excel文件并生成音频...")
-    read_excel_data()
+    if args.bulk:
+        run_bulk(args.path, args.output_dir, args.api_url, workers=args.workers, in_process=args.in_process,
+                 retries=args.retries, checkpoint_path=args.checkpoint, gap_ms=args.gap_ms)
+    else:
+        read_excel_data(args.path, args.output_dir, args.api_url)
     print("\n处理完成！")
\ No newline at end of file
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成结果键与请求合并
+相同的 (文本, 语速) 请求对应同一个结果键（输出索引见 output_store.py），
+并发的相同请求只触发一次合成
+"""
+
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """
+    规范化文本：统一全角/半角字符，合并连续空白
+    """
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def make_result_key(text, speed, backend='gtts'):
+    """
+    生成合成结果的索引键
+    非gtts后端的键包含后端名，替身后端生成的静音文件不会被当作gtts的结果返回
+    """
+    raw = f"{speed}\x1f{normalize_text(text)}"
+    if backend != 'gtts':
+        raw = f"{backend}\x1f{raw}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def make_compose_key(parts, gap_ms, speed, backend='gtts'):
+    """生成组合模式的索引键"""
+    raw = '\x1e'.join(normalize_text(part) for part in parts)
+    return make_result_key(f"{raw}\x1e{gap_ms}", speed, backend)
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """等待调用完成，返回结果或抛出调用方的异常"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """
+    请求合并：同一个键同时只执行一次fn，其余调用方等待并共享结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """
+        登记一次调用，用于跨越多个步骤的调用（如流式响应）
+        返回 (调用, 是否为执行者)；执行者完成后必须调用 finish，其余调用方用 call.wait() 等待结果
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """执行者完成调用，唤醒所有等待者"""
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def do(self, key, fn):
+        """
+        执行fn()并返回 (结果, 是否与其他请求共享)
+        fn抛出的异常会同样抛给所有等待者
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(), True
+
+        result = error = None
+        try:
+            result = fn()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.finish(key, call, result, error)
+
+        return result, False
+
+    def in_flight(self):
+        """当前进行中的调用数量"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+片段音频缓存
+按 (片段文本, 语言, TLD, slow) 内容寻址，把TTS返回的片段音频持久化到磁盘，
+并按总大小/最近访问时间做LRU淘汰
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def make_segment_key(text, lang, tld, slow):
+    """
+    生成片段缓存键
+    同一段文本在相同语言、TLD和语速模式下总是得到同一个键
+    """
+    raw = '\x1f'.join([text.strip(), lang, tld, '1' if slow else '0'])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """
+    磁盘片段缓存
+
+    参数:
+    - cache_dir: 缓存目录，文件按键的前两位分目录存放
+    - max_bytes: 缓存总大小上限（字节），超过后淘汰最久未访问的片段
+    - max_age: 片段最长保留时间（秒），按最近访问时间计算，None表示不限制
+    """
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # 键 -> (大小, 最近访问时间)，按访问顺序排列，最旧的在前面
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+        self.evict()
+
+    def _path_for(self, key):
+        return self.cache_dir / key[:2] / f"{key}.mp3"
+
+    def _load_index(self):
+        """启动时扫描一次缓存目录，重建内存索引"""
+        entries = []
+        for shard in self.cache_dir.iterdir():
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard):
+                if not entry.name.endswith('.mp3'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+
+        entries.sort()
+        for mtime, key, size in entries:
+            self._entries[key] = (size, mtime)
+            self._total_bytes += size
+
+        logger.info(f"片段缓存已加载: {len(self._entries)} 个片段, {self._total_bytes} 字节")
+
+    def get(self, key):
+        """
+        读取缓存片段，不存在时返回None
+        内存索引中没有的键会再检查一次磁盘，多个工作进程共享同一缓存目录时可以复用彼此写入的片段
+        """
+        path = self._path_for(key)
+        now = time.time()
+        with self._lock:
+            known = key in self._entries
+            if known:
+                size, _ = self._entries[key]
+                self._entries[key] = (size, now)
+                self._entries.move_to_end(key)
+
+        try:
+            data = path.read_bytes()
+        except OSError:
+            # 文件不存在或被外部删除，视为未命中
+            with self._lock:
+                if key in self._entries:
+                    self._total_bytes -= self._entries.pop(key)[0]
+                self.misses += 1
+            return None
+
+        # 用mtime记录最近访问时间，重启后仍能按LRU顺序淘汰
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+        with self._lock:
+            if not known and key not in self._entries:
+                self._entries[key] = (len(data), now)
+                self._total_bytes += len(data)
+            self.hits += 1
+        return data
+
+    def contains(self, key):
+        """检查片段是否已缓存，不读取内容，也不计入命中统计和访问时间"""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self._path_for(key).exists()
+
+    def put(self, key, data):
+        """写入片段，先写临时文件再原子替换"""
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except Exception:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[0]
+            self._entries[key] = (len(data), time.time())
+            self._total_bytes += len(data)
+            victims = self._collect_victims()
+
+        self._remove_files(victims)
+
+    def _collect_victims(self):
+        """挑出需要淘汰的片段（调用方需持有锁）"""
+        victims = []
+        now = time.time()
+        while self._entries:
+            key, (size, last_access) = next(iter(self._entries.items()))
+            expired = self.max_age is not None and now - last_access > self.max_age
+            oversize = self.max_bytes is not None and self._total_bytes > self.max_bytes
+            if not (expired or oversize):
+                break
+            self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            victims.append(key)
+        return victims
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                self._path_for(key).unlink()
+            except OSError:
+                pass
+
+    def get_or_create(self, text, lang, tld, slow, synthesize):
+        """
+        查询缓存，未命中时调用synthesize(text, lang, tld, slow)生成并写入缓存
+
+        返回:
+        - 片段音频字节
+        """
+        key = make_segment_key(text, lang, tld, slow)
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        data = synthesize(text, lang, tld, slow)
+        if data:
+            self.put(key, data)
+        return data
+
+    def evict(self):
+        """按当前配置执行一次淘汰，返回淘汰的片段数"""
+        with self._lock:
+            victims = self._collect_victims()
+        self._remove_files(victims)
+        return len(victims)
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中英文分段
+用预编译的正则一次扫描整段文本，得到 (语言, 区间) 列表，不逐字符拼接字符串
+- 中文：CJK统一汉字（含扩展A~扩展G、兼容汉字）及 〇
+- 英文：拉丁字母（含带重音的拉丁字母，如 café）
+- 其他字符（空白、数字、中英文标点）归入前一段；文本开头的归入第一段；
+  左引号、左括号（如 “ 《 （）归入后一段
+"""
+
+import re
+
+ZH = 'zh-CN'
+EN = 'en-US'
+
+_CJK = (
+    '〇'
+    '㐀-䶿'          # 扩展A
+    '一-鿿'          # 基本区
+    '豈-﫿'          # 兼容汉字
+    '\U00020000-\U0002ebef'  # 扩展B~F
+    '\U00030000-\U0003134f'  # 扩展G
+)
+_LATIN = 'A-Za-zÀ-ÖØ-öø-ɏ'
+
+# 左引号、左括号：归入其后的片段
+_OPEN = '“‘「『《〈（【〔([{'
+
+# 一段中文：可选的左引号/括号 + 一个汉字 + 其后所有非拉丁字母的字符，
+# 结尾不含空白和左引号/括号（留给下一段），因此匹配区间本身就是去掉首尾空白的片段；一段英文同理
+# 匹配只从一串左引号/括号的开头开始（否定后顾）：从串中间开始的结果与从开头开始相同，
+# 不加限制时每个位置都要重新扫描整串，连续的左括号会使耗时随长度平方增长
+_SEGMENT = re.compile(
+    f'(?P<zh>(?<![{_OPEN}])[{_OPEN}]*[{_CJK}](?:[^{_LATIN}]*[^{_LATIN}\\s{_OPEN}])?)'
+    f'|(?P<en>(?<![{_OPEN}])[{_OPEN}]*[{_LATIN}](?:[^{_CJK}]*[^{_CJK}\\s{_OPEN}])?)'
+)
+
+
+def segment_spans(text):
+    """
+    将文本切分为语言片段
+
+    返回:
+    - [(语言代码, (起始, 结束)), ...]，区间不含首尾空白；没有中英文字符时返回空列表
+    """
+    spans = [(ZH if match.lastgroup == 'zh' else EN, match.span()) for match in _SEGMENT.finditer(text)]
+    if spans and spans[0][1][0] > 0:
+        # 文本开头的标点、数字归入第一段
+        lang, (_, end) = spans[0]
+        spans[0] = (lang, (len(text) - len(text.lstrip()), end))
+    return spans
+
+
+def segment_text(text):
+    """
+    一次扫描得到待合成的语言片段：单一语言的文本返回整段，没有中英文字符时按中文整段返回
+
+    返回:
+    - [(语言代码, 片段文本), ...]
+    """
+    spans = segment_spans(text)
+    if len(spans) == 1:
+        return [(spans[0][0], text)]
+    if not spans:
+        return [(ZH, text)]
+    return [(lang, text[start:end]) for lang, (start, end) in spans]
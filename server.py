@@ -7,102 +7,158 @@
 
 import os
 import json
-import uuid
 import logging
 import re
+import sys
 import time
+import threading
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory
+from urllib.parse import quote
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
-import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from segment_cache import SegmentCache, make_segment_key
+from result_cache import SingleFlight, make_compose_key, make_result_key
+from output_store import OutputStore
+from clip_cache import HotClipCache
+from maintenance import OutputMaintenance
+from synthesis_engine import SynthesisEngine
+from audio_pipeline import StreamEncoder, audio_frames, change_speed, compose_segments, decode_mp3, render_segments
+from mp3_frames import silent_frames
+from tts_backends import create_backend
+from metrics import registry, stage, count, start_request_timing, finish_request_timing
+from serving import InFlightTracker, serve
+from job_queue import JobQueue, QueueFullError
+from chunker import chunk_text
+from segmenter import segment_text
+from warmup import create_warmup, iter_terms
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+api = Blueprint('tts', __name__)
+
+# 语音合成后端：gtts（默认）或 stub（离线替身，用于压测和CI）
+TTS_BACKEND = os.environ.get('TTS_BACKEND', 'gtts')
+
+# 配置目录：替身后端的输出与gtts的输出分开存放
+default_output_dir = 'output' if TTS_BACKEND == 'gtts' else f'output-{TTS_BACKEND}'
+OUTPUT_DIR = Path(os.environ.get('TTS_OUTPUT_DIR', default_output_dir))
+if TTS_BACKEND == 'stub':
+    backend_options = {
+        'delay': float(os.environ.get('TTS_STUB_DELAY', '0.3')),
+        'jitter': float(os.environ.get('TTS_STUB_JITTER', '0.2')),
+    }
+else:
+    # 连接池、按TLD限流、重试和熔断；TTS_GTTS_BASE_URL 可指向本地模拟服务（见 benchmarks/mock_gtts_server.py）
+    backend_options = {
+        'base_url': os.environ.get('TTS_GTTS_BASE_URL') or None,
+        'pool_size': int(os.environ.get('TTS_GTTS_POOL_SIZE', '16')),
+        'rate': float(os.environ.get('TTS_GTTS_RATE', '5')),
+        'burst': int(os.environ.get('TTS_GTTS_BURST', '10')),
+        'retries': int(os.environ.get('TTS_GTTS_RETRIES', '4')),
+        'backoff': float(os.environ.get('TTS_GTTS_BACKOFF', '0.5')),
+        'timeout': float(os.environ.get('TTS_GTTS_TIMEOUT', '15')),
+        'breaker_threshold': int(os.environ.get('TTS_GTTS_BREAKER_THRESHOLD', '10')),
+        'breaker_reset': float(os.environ.get('TTS_GTTS_BREAKER_RESET', '30')),
+    }
 try:
-    from gtts import gTTS
-    from gtts.lang import tts_langs
+    tts_backend = create_backend(TTS_BACKEND, **backend_options)
 except ImportError:
     print("请先安装gTTS库: pip install gtts")
     exit(1)
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# 片段缓存配置：重复出现的单词/短语只向后端请求一次
+# 非gTTS后端使用单独的缓存目录，避免替身音频混入真实缓存
+default_cache_dir = 'cache/segments' if TTS_BACKEND == 'gtts' else f'cache/segments-{TTS_BACKEND}'
+SEGMENT_CACHE_DIR = Path(os.environ.get('TTS_SEGMENT_CACHE_DIR', default_cache_dir))
+SEGMENT_CACHE_MAX_MB = int(os.environ.get('TTS_SEGMENT_CACHE_MAX_MB', '512'))
+SEGMENT_CACHE_MAX_DAYS = int(os.environ.get('TTS_SEGMENT_CACHE_MAX_DAYS', '30'))
+segment_cache = SegmentCache(
+    SEGMENT_CACHE_DIR,
+    max_bytes=SEGMENT_CACHE_MAX_MB * 1024 * 1024,
+    max_age=SEGMENT_CACHE_MAX_DAYS * 24 * 3600,
+)
 
-app = Flask(__name__)
-CORS(app)  # 启用跨域支持
-
-# 配置目录
-OUTPUT_DIR = Path('output')
-OUTPUT_DIR.mkdir(exist_ok=True)
-
-# 支持的语言
-SUPPORTED_LANGUAGES = {
-    'zh': '中文',
-    'en': '英文',
-    'zh-CN': '中文（简体）',
-    'zh-TW': '中文（繁体）',
-    'en-US': '英文（美国）',
-    'en-GB': '英文（英国）'
-}
-
-def detect_language(text):
-    """
-    检测文本语言类型
-    对于中英文混合文本，返回'mixed'以便特殊处理
-    """
-    chinese_count = 0
-    english_count = 0
-    
-    for char in text:
-        if '\u4e00' <= char <= '\u9fff':  # 中文字符范围
-            chinese_count += 1
-        elif char.isascii() and char.isalpha():  # 英文字符
-            english_count += 1
-    
-    total_chars = chinese_count + english_count
-    if total_chars == 0:
-        return 'zh-CN'  # 默认中文
-    
-    # 如果同时包含中文和英文，返回mixed
-    if chinese_count > 0 and english_count > 0:
-        return 'mixed'
-    elif chinese_count > 0:
-        return 'zh-CN'  # 标准普通话
-    else:
-        return 'en-US'  # 标准美式英文
-
-def split_mixed_text(text):
-    """
-    将中英文混合文本分割成中文和英文片段
-    """
-    segments = []
-    current_segment = ""
-    current_lang = None
-    
-    for char in text:
-        if '\u4e00' <= char <= '\u9fff':  # 中文字符
-            if current_lang == 'en' and current_segment.strip():
-                segments.append(('en-US', current_segment.strip()))
-                current_segment = ""
-            current_lang = 'zh'
-            current_segment += char
-        elif char.isascii() and char.isalpha():  # 英文字符
-            if current_lang == 'zh' and current_segment.strip():
-                segments.append(('zh-CN', current_segment.strip()))
-                current_segment = ""
-            current_lang = 'en'
-            current_segment += char
-        else:  # 标点符号、空格等
-            current_segment += char
-    
-    # 添加最后一个片段
-    if current_segment.strip():
-        if current_lang == 'zh':
-            segments.append(('zh-CN', current_segment.strip()))
-        elif current_lang == 'en':
-            segments.append(('en-US', current_segment.strip()))
-    
-    return segments
+# 输出索引：相同 (文本, 语速) 直接返回已生成的文件，文件按哈希分目录存放
+output_store = OutputStore(OUTPUT_DIR)
+
+# 输出目录后台维护：磁盘配额和过期时间，按最近访问时间淘汰（0表示不限，默认不自动淘汰）
+# 批量生成的文件不经过 /output 访问，访问时间不会更新，开启前需确认这些文件可以被删除
+OUTPUT_MAX_MB = int(os.environ.get('TTS_OUTPUT_MAX_MB', '0'))
+OUTPUT_MAX_DAYS = int(os.environ.get('TTS_OUTPUT_MAX_DAYS', '0'))
+MAINTENANCE_INTERVAL = int(os.environ.get('TTS_MAINTENANCE_INTERVAL', '300'))
+MAINTENANCE_BATCH = int(os.environ.get('TTS_MAINTENANCE_BATCH', '200'))
+maintenance = OutputMaintenance(
+    output_store,
+    interval=MAINTENANCE_INTERVAL,
+    max_age=OUTPUT_MAX_DAYS * 24 * 3600 or None,
+    max_bytes=OUTPUT_MAX_MB * 1024 * 1024 or None,
+    batch_size=MAINTENANCE_BATCH,
+)
+single_flight = SingleFlight()
+segment_flight = SingleFlight()
+
+# 运行指标（/api/metrics）
+REQUESTS_TOTAL = registry.counter('tts_requests_total', '合成请求数', ('endpoint', 'status'))
+REQUEST_SECONDS = registry.histogram('tts_request_seconds', '合成请求耗时（秒）', ('endpoint',))
+SEGMENTS_TOTAL = registry.counter('tts_segments_total', '需要合成的语言片段数')
+BACKEND_CALLS_TOTAL = registry.counter('tts_backend_calls_total', '调用语音合成后端的次数', ('backend', 'status'))
+OUTPUT_BYTES_TOTAL = registry.counter('tts_output_bytes_total', '写入输出目录的音频字节数')
+RESULT_LOOKUPS_TOTAL = registry.counter('tts_result_cache_lookups_total', '结果索引查询次数', ('result',))
+for stat_name, metric_type in [('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                               ('entries', 'gauge'), ('bytes', 'gauge')]:
+    registry.gauge(
+        f'tts_segment_cache_{stat_name}' + ('_total' if metric_type == 'counter' else ''),
+        f'片段缓存 {stat_name}',
+        lambda stat_name=stat_name: segment_cache.stats()[stat_name],
+        metric_type,
+    )
+
+# 音频文件服务：内容不变，浏览器可长期缓存；最常播放的小文件保存在内存中
+AUDIO_MAX_AGE = 365 * 24 * 3600
+HOT_CLIP_CACHE_MB = int(os.environ.get('TTS_HOT_CLIP_CACHE_MB', '64'))
+HOT_CLIP_MAX_KB = int(os.environ.get('TTS_HOT_CLIP_MAX_KB', '1024'))
+hot_clips = HotClipCache(HOT_CLIP_CACHE_MB * 1024 * 1024, HOT_CLIP_MAX_KB * 1024)
+
+for stat_name, metric_type in [('hits', 'counter'), ('misses', 'counter'), ('entries', 'gauge'), ('bytes', 'gauge')]:
+    registry.gauge(
+        f'tts_hot_clip_cache_{stat_name}' + ('_total' if metric_type == 'counter' else ''),
+        f'热门音频内存缓存 {stat_name}',
+        lambda stat_name=stat_name: hot_clips.stats()[stat_name],
+        metric_type,
+    )
+
+registry.gauge('tts_output_files', '输出目录中的音频文件数', lambda: output_store.stats()['files'])
+registry.gauge('tts_output_bytes', '输出目录中的音频总字节数', lambda: output_store.stats()['bytes'])
+registry.gauge('tts_output_evicted_files_total', '后台维护淘汰的输出文件数',
+               lambda: maintenance.stats()['evictedFiles'], 'counter')
+registry.gauge('tts_output_evicted_bytes_total', '后台维护释放的字节数',
+               lambda: maintenance.stats()['freedBytes'], 'counter')
+
+# 上游限流和熔断统计（仅gtts后端）
+if hasattr(tts_backend, 'upstream_stats'):
+    CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+    for stat_name, metric_name, metric_type, documentation in [
+        ('state', 'tts_upstream_circuit_state', 'gauge', '熔断器状态（0=关闭，1=半开，2=打开）'),
+        ('openedTotal', 'tts_upstream_circuit_opened_total', 'counter', '熔断器打开次数'),
+        ('rejectedTotal', 'tts_upstream_circuit_rejected_total', 'counter', '熔断期间被拒绝的请求数'),
+        ('retries', 'tts_upstream_retries_total', 'counter', '上游请求重试次数'),
+        ('throttledSeconds', 'tts_upstream_throttled_seconds_total', 'counter', '限流等待的总时间（秒）'),
+    ]:
+        registry.gauge(
+            metric_name, documentation,
+            lambda stat_name=stat_name: {
+                (tld,): CIRCUIT_STATES.get(stats[stat_name], stats[stat_name])
+                for tld, stats in tts_backend.upstream_stats().items()
+            },
+            metric_type, labelnames=('tld',),
+        )
 
 def get_voice_lang_and_tld(lang_code, voice=None):
     """
@@ -127,113 +183,161 @@ def get_voice_lang_and_tld(lang_code, voice=None):
     # 其他语言返回原代码，使用默认TLD
     return lang_code, 'com'
 
-def adjust_audio_speed(audio_path, speed_factor):
+def backend_synthesize(text, lang, tld, slow):
     """
-    调整音频播放速度
+    调用当前语音合成后端合成单个片段，返回MP3字节
     """
+    count('backendCalls')
     try:
-        from pydub import AudioSegment
-        audio = AudioSegment.from_mp3(str(audio_path))
-        
-        # 调整播放速度
-        if speed_factor != 1.0:
-            # 改变播放速度但保持音调
-            new_sample_rate = int(audio.frame_rate * speed_factor)
-            audio_with_new_speed = audio._spawn(audio.raw_data, overrides={"frame_rate": new_sample_rate})
-            audio_with_new_speed = audio_with_new_speed.set_frame_rate(audio.frame_rate)
-            return audio_with_new_speed
-        return audio
-    except ImportError:
-        logger.warning("pydub未安装，无法调整语速")
-        return AudioSegment.from_mp3(str(audio_path))
-
-def text_to_speech(text, output_path, speed=2):
+        with stage('tts'):
+            data = tts_backend.synthesize(text, lang, tld, slow)
+    except Exception:
+        BACKEND_CALLS_TOTAL.inc(backend=tts_backend.name, status='error')
+        raise
+    BACKEND_CALLS_TOTAL.inc(backend=tts_backend.name, status='ok')
+    return data
+
+def synthesize_segment(text, lang, tld, slow):
+    """
+    合成单个片段，优先读取片段缓存
+    并发请求同一片段时只调用一次后端
+    """
+    key = make_segment_key(text, lang, tld, slow)
+    data, _ = segment_flight.do(
+        key, lambda: segment_cache.get_or_create(text, lang, tld, slow, backend_synthesize)
+    )
+    return data
+
+# 片段并行合成引擎：混合文本的各片段同时请求
+SEGMENT_WORKERS = int(os.environ.get('TTS_SEGMENT_WORKERS', '4'))
+SEGMENT_TIMEOUT = float(os.environ.get('TTS_SEGMENT_TIMEOUT', '30'))
+synthesis_engine = SynthesisEngine(
+    synthesize_segment,
+    max_workers=SEGMENT_WORKERS,
+    segment_timeout=SEGMENT_TIMEOUT,
+)
+
+# 5档语速映射: 0=0.5x, 1=0.7x, 2=1.0x, 3=1.3x, 4=1.6x
+SPEED_FACTORS = [0.5, 0.7, 1.0, 1.3, 1.6]
+
+def text_to_speech(text, output_path, speed=2, progress=None):
     """
     将文本转换为语音并保存为MP3文件
     对于中英文混合文本，分别处理并合并
     使用标准成人播音：普通话和美式英语
+    各片段只解码一次，在内存中拼接并调整语速后只编码一次
+    超过 CHUNK_MAX_CHARS 字符的长文本按句子分块并行合成，逐块写入文件
     
     参数:
     - text: 要合成的文本
     - output_path: 输出文件路径
     - speed: 语速 (0=最慢, 1=慢速, 2=正常, 3=快速, 4=最快)
+    - progress: 进度回调 progress(已完成片段数, 片段总数)
     """
     try:
-        # 检测文本语言
-        lang = detect_language(text)
-        logger.info(f"检测到语言类型: {lang}")
+        if len(text) > CHUNK_MAX_CHARS:
+            # 长文本按句子分块并行合成，逐块写入文件
+            chunked_text_to_speech(text, output_path, speed, progress)
+            logger.info(f"音频文件已保存: {output_path}")
+            return True, None
         
-        if lang == 'mixed':
-            # 处理中英文混合文本
-            segments = split_mixed_text(text)
-            logger.info(f"分割为 {len(segments)} 个片段")
-            
-            # 为每个片段生成音频
-            audio_files = []
-            temp_dir = Path(tempfile.mkdtemp())
-            
-            try:
-                for i, (seg_lang, seg_text) in enumerate(segments):
-                    if seg_text.strip():  # 只处理非空片段
-                        temp_file = temp_dir / f"segment_{i}.mp3"
-                        
-                        # 使用标准播音语言代码和TLD
-                        final_lang, tld = get_voice_lang_and_tld(seg_lang)
-                        
-                        # 根据语速设置slow参数
-                        slow_mode = (speed <= 1)  # 最慢和慢速时使用slow=True
-                        
-                        tts = gTTS(text=seg_text, lang=final_lang, tld=tld, slow=slow_mode)
-                        tts.save(str(temp_file))
-                        audio_files.append(temp_file)
-                        logger.info(f"片段 {i+1} ({final_lang}): {seg_text[:20]}...")
-                
-                # 合并音频文件
-                if len(audio_files) == 1:
-                    # 只有一个文件，直接移动
-                    audio_files[0].rename(output_path)
-                else:
-                    # 多个文件需要合并
-                    merge_audio_files(audio_files, output_path)
-                
-                # 应用语速调整
-                if speed != 2:
-                    # 5档语速映射: 0=0.5x, 1=0.7x, 2=1.0x, 3=1.3x, 4=1.6x
-                    speed_factors = [0.5, 0.7, 1.0, 1.3, 1.6]
-                    speed_factor = speed_factors[speed]
-                    adjusted_audio = adjust_audio_speed(output_path, speed_factor)
-                    adjusted_audio.export(str(output_path), format="mp3")
-                
-            finally:
-                # 清理临时文件
-                import shutil
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        # 一次扫描完成语言检测和中英文分段，单一语言文本为整段
+        with stage('segment_text'):
+            segments = segment_text(text)
+        if len(segments) > 1:
+            logger.info(f"检测到语言类型: mixed, 分割为 {len(segments)} 个片段")
         else:
-            # 单一语言文本
-            # 确保使用正确的语言代码
-            if lang == 'zh-CN':
-                lang_code = 'zh-CN'  # 普通话
-            elif lang == 'en-US':
-                lang_code = 'en'  # gTTS的英文代码
-            else:
-                lang_code = lang
-            
+            logger.info(f"检测到语言类型: {segments[0][0]}")
+        
+        # 根据语速设置slow参数
+        slow_mode = (speed <= 1)  # 最慢和慢速时使用slow=True
+        tasks = build_segment_tasks(segments, slow_mode)
+        SEGMENTS_TOTAL.inc(len(tasks))
+        count('segments', len(tasks))
+        
+        # 所有片段并行合成，结果保持原顺序
+        with stage('segments'):
+            audio_data = synthesis_engine.synthesize_all(tasks, progress)
+        if len(tasks) > 1:
+            for i, (seg_text, final_lang, _, _) in enumerate(tasks):
+                logger.info(f"片段 {i+1} ({final_lang}): {seg_text[:20]}...")
+        
+        # 解码、合并、调整语速、编码一次完成
+        write_output(output_path, render_segments(audio_data, SPEED_FACTORS[speed]))
+        
+        logger.info(f"音频文件已保存: {output_path}")
+        return True, None
+        
+    except Exception as e:
+        error_msg = f"语音合成失败: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+def write_output(output_path, data):
+    """写入输出文件并记录字节数"""
+    with stage('write'):
+        Path(output_path).write_bytes(data)
+    OUTPUT_BYTES_TOTAL.inc(len(data))
+    count('bytes', len(data))
+
+def build_segment_tasks(segments, slow_mode):
+    """
+    将 (语言, 文本) 片段转换为待合成任务
+    
+    返回:
+    - [(片段文本, 语言代码, TLD, slow), ...]
+    """
+    tasks = []
+    for seg_lang, seg_text in segments:
+        if seg_text.strip():  # 只处理非空片段
             # 使用标准播音语言代码和TLD
-            final_lang, tld = get_voice_lang_and_tld(lang_code)
-            
-            # 根据语速设置slow参数
-            slow_mode = (speed <= 1)  # 最慢和慢速时使用slow=True
-            
-            tts = gTTS(text=text, lang=final_lang, tld=tld, slow=slow_mode)
-            tts.save(str(output_path))
-            
-            # 应用语速调整
-            if speed != 2:
-                # 5档语速映射: 0=0.5x, 1=0.7x, 2=1.0x, 3=1.3x, 4=1.6x
-                speed_factors = [0.5, 0.7, 1.0, 1.3, 1.6]
-                speed_factor = speed_factors[speed]
-                adjusted_audio = adjust_audio_speed(output_path, speed_factor)
-                adjusted_audio.export(str(output_path), format="mp3")
+            final_lang, tld = get_voice_lang_and_tld(seg_lang)
+            tasks.append((seg_text.strip(), final_lang, tld, slow_mode))
+    return tasks
+
+def plan_segments(text, slow_mode):
+    """
+    将一段文本拆分为待合成的片段列表
+    
+    返回:
+    - [(片段文本, 语言代码, TLD, slow), ...]
+    """
+    return build_segment_tasks(segment_text(text), slow_mode)
+
+def compose_to_speech(parts, output_path, speed=2, gap_ms=0, progress=None):
+    """
+    组合模式：每个不同的部分只合成一次，在内存中按顺序拼接（无需调速时按帧拼接，不解码）
+    例如 ["apple", "apple", "苹果"] 只请求 "apple" 和 "苹果" 两次
+    
+    参数:
+    - parts: 文本部分列表
+    - output_path: 输出文件路径
+    - speed: 语速 (0=最慢, 1=慢速, 2=正常, 3=快速, 4=最快)
+    - gap_ms: 相邻部分之间插入的静音时长（毫秒）
+    - progress: 进度回调 progress(已完成片段数, 片段总数)
+    """
+    try:
+        # 根据语速设置slow参数
+        slow_mode = (speed <= 1)  # 最慢和慢速时使用slow=True
+        
+        # 每个不同的部分拆分为语言片段，所有片段一起并行合成
+        unique_parts = list(dict.fromkeys(parts))
+        tasks = []
+        spans = {}
+        for part in unique_parts:
+            part_tasks = plan_segments(part, slow_mode)
+            spans[part] = (len(tasks), len(tasks) + len(part_tasks))
+            tasks.extend(part_tasks)
+        logger.info(f"组合合成: {len(parts)} 个部分, {len(unique_parts)} 个不同部分, {len(tasks)} 个片段")
+        SEGMENTS_TOTAL.inc(len(tasks))
+        count('segments', len(tasks))
+        
+        with stage('segments'):
+            audio_data = synthesis_engine.synthesize_all(tasks, progress)
+        
+        # 重复的部分直接复用；需要调速时每个片段只解码一次、只编码一次
+        groups = [spans[part] for part in parts]
+        write_output(output_path, compose_segments(audio_data, groups, SPEED_FACTORS[speed], gap_ms))
         
         logger.info(f"音频文件已保存: {output_path}")
         return True, None
@@ -265,37 +369,548 @@ def sanitize_filename(text):
     
     return filename
 
-def merge_audio_files(audio_files, output_path):
+def allocate_output_path(text, preferred_name=None):
     """
-    合并多个音频文件
-    由于gTTS生成的是MP3文件，这里使用简单的文件连接
-    注意：这是一个简化的实现，实际项目中建议使用pydub等库
+    根据文本内容在输出索引中预留一个未被占用的文件名，重名时添加序号
+    指定preferred_name时优先使用该名称
+    合成失败时需调用 output_store.release 释放
     """
-    try:
-        # 尝试导入pydub进行音频合并
-        from pydub import AudioSegment
-        
-        combined = AudioSegment.empty()
-        for audio_file in audio_files:
-            audio = AudioSegment.from_mp3(str(audio_file))
-            combined += audio
+    if preferred_name:
+        base_filename = sanitize_filename(re.sub(r'\.mp3$', '', preferred_name, flags=re.IGNORECASE))
+    else:
+        base_filename = sanitize_filename(text)
+    return output_store.reserve(base_filename)
+
+def render_text(text, speed, preferred_name=None, parts=None, gap_ms=0, progress=None):
+    """
+    合成文本并登记到结果索引
+    相同 (文本, 语速) 的请求直接返回已有文件；并发的相同请求只合成一次
+    preferred_name 仅在需要新生成文件时作为文件名使用
+    指定parts时使用组合模式，文本由各部分拼接而成
+    progress 为进度回调 progress(已完成片段数, 片段总数)
+    
+    返回:
+    - (文件名, 错误信息, 是否复用已有结果) 元组，失败时文件名为None
+    """
+    if parts:
+        key = make_compose_key(parts, gap_ms, speed, TTS_BACKEND)
+    else:
+        key = make_result_key(text, speed, TTS_BACKEND)
+    with stage('result_lookup'):
+        filename = output_store.lookup(key)
+    if filename:
+        RESULT_LOOKUPS_TOTAL.inc(result='hit')
+        return filename, None, True
+    RESULT_LOOKUPS_TOTAL.inc(result='miss')
+    
+    def render():
+        # 等待锁期间可能已有其他请求完成了合成
+        existing = output_store.lookup(key)
+        if existing:
+            return existing, None, True
         
-        combined.export(str(output_path), format="mp3")
+        with stage('allocate_filename'):
+            filename, output_path = allocate_output_path(text, preferred_name)
+        try:
+            if parts:
+                success, error_msg = compose_to_speech(parts, output_path, speed, gap_ms, progress)
+            else:
+                success, error_msg = text_to_speech(text, output_path, speed, progress)
+        except BaseException:
+            output_store.release(filename)
+            raise
+        if not success:
+            output_store.release(filename)
+            return None, error_msg, False
+        output_store.commit(filename, key, text, speed)
+        return filename, None, False
+    
+    with inflight.track():
+        (filename, error_msg, reused), shared = single_flight.do(key, render)
+    return filename, error_msg, reused or shared
+
+# 长文本分块：按句子切分为不超过该长度的块并行合成，块之间可插入停顿
+CHUNK_MAX_CHARS = int(os.environ.get('TTS_CHUNK_MAX_CHARS', '100'))
+SENTENCE_PAUSE_MS = int(os.environ.get('TTS_SENTENCE_PAUSE_MS', '0'))
+# 流式合成时当前块之外提前合成的块数
+STREAM_READAHEAD = int(os.environ.get('TTS_STREAM_READAHEAD', '2'))
+
+def plan_chunks(text, slow_mode):
+    """
+    按句子边界将文本切分为不超过 CHUNK_MAX_CHARS 字符的块，每块再按语言拆分为片段
+    
+    返回:
+    - (片段任务列表, 与之对应的"该片段是否为一块的结尾"列表)
+    """
+    tasks = []
+    boundaries = []
+    for chunk in chunk_text(text, CHUNK_MAX_CHARS):
+        chunk_tasks = plan_segments(chunk, slow_mode)
+        if chunk_tasks:
+            tasks.extend(chunk_tasks)
+            boundaries.extend([False] * (len(chunk_tasks) - 1) + [True])
+    return tasks, boundaries
+
+@lru_cache(maxsize=16)
+def silence_mp3(duration_ms):
+    """指定时长的静音MP3帧（不含文件头），格式与gTTS输出一致"""
+    return silent_frames(duration_ms)
+
+def render_chunks(tasks, boundaries, speed_factor, window, pause_ms=0, progress=None):
+    """
+    按顺序逐块产出MP3字节，同时最多有window个片段在合成，内存占用与文本长度无关
+    不需要变速时去掉各片段的标签和信息头，按帧直接相接；
+    需要变速时每块解码、变速后写入同一个连续编码器，整段只编码一次，块与块之间不会多出编码器延迟和填充；
+    块之间插入pause_ms毫秒的静音
+    
+    参数:
+    - tasks, boundaries: plan_chunks 的返回值
+    - speed_factor: 语速倍率
+    - window: 同时合成的最大片段数（含当前块）
+    - pause_ms: 块之间的停顿（毫秒）
+    - progress: 进度回调 progress(已完成片段数, 片段总数)
+    """
+    total = len(tasks)
+    futures = deque()
+    next_index = 0
+    encoder = StreamEncoder() if speed_factor != 1.0 else None
+    if progress is not None:
+        progress(0, total)
+    try:
+        for i in range(total):
+            while next_index < total and len(futures) < window:
+                # 超时从提交时开始计算，与 synthesize_all 一致
+                futures.append((synthesis_engine.submit(*tasks[next_index]), time.monotonic() + SEGMENT_TIMEOUT))
+                next_index += 1
+            future, deadline = futures.popleft()
+            data = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            pause = pause_ms > 0 and boundaries[i] and i < total - 1
+            if encoder is not None:
+                encoder.write(change_speed(decode_mp3(data), speed_factor))
+                if pause:
+                    encoder.write_silence(pause_ms)
+                # 编码器收到整块PCM后很快就有输出，稍等片刻让流式接口及时拿到这一块
+                data = encoder.read(wait=0.2)
+            else:
+                data = audio_frames(data)
+                if pause:
+                    data += silence_mp3(pause_ms)
+            if data:
+                yield data
+            if progress is not None:
+                progress(i + 1, total)
+        if encoder is not None:
+            data = encoder.finish()
+            if data:
+                yield data
+    finally:
+        # 出错或被提前关闭时取消尚未开始的片段
+        for future, _ in futures:
+            future.cancel()
+        if encoder is not None:
+            encoder.close()
+
+def write_chunks(output_path, chunks):
+    """
+    逐块写入输出文件：先写入同目录的临时文件，全部完成后再改名
+    
+    返回:
+    - 写入的字节数
+    """
+    output_path = Path(output_path)
+    part_path = output_path.with_name(f".{output_path.name}.part")
+    written = 0
+    try:
+        with stage('write'), open(part_path, 'wb') as f:
+            for data in chunks:
+                f.write(data)
+                written += len(data)
+        os.replace(part_path, output_path)
+    except BaseException:
+        chunks.close()
+        try:
+            part_path.unlink()
+        except OSError:
+            pass
+        raise
+    OUTPUT_BYTES_TOTAL.inc(written)
+    count('bytes', written)
+    return written
+
+def chunked_text_to_speech(text, output_path, speed=2, progress=None):
+    """
+    长文本分块合成：按句子切块后并行合成，按顺序逐块写入输出文件
+    耗时随并发数而不是文本长度增长，内存中最多保留 SEGMENT_WORKERS*2 个块
+    """
+    tasks, boundaries = plan_chunks(text, speed <= 1)
+    if not tasks:
+        raise ValueError('文本中没有可朗读的内容')
+    SEGMENTS_TOTAL.inc(len(tasks))
+    count('segments', len(tasks))
+    logger.info(f"长文本分块合成: {len(text)} 字符, {len(tasks)} 个片段")
+    
+    chunks = render_chunks(tasks, boundaries, SPEED_FACTORS[speed], SEGMENT_WORKERS * 2,
+                           SENTENCE_PAUSE_MS, progress)
+    write_chunks(output_path, chunks)
+
+class StreamProgress:
+    """
+    流式合成的进度：后台线程写入的字节数和结束状态，响应按进度从文件中读出新写入的部分
+    """
+
+    def __init__(self, part_path, output_path):
+        self.part_path = part_path
+        self.output_path = output_path
+        self.written = 0
+        self.done = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def advance(self, written):
+        with self._condition:
+            self.written = written
+            self._condition.notify_all()
+
+    def close(self, error=None):
+        with self._condition:
+            self.done = True
+            self.error = error
+            self._condition.notify_all()
+
+    def wait(self, offset):
+        """等待写入超过offset字节或合成结束，返回 (已写入字节数, 是否结束)"""
+        with self._condition:
+            while self.written <= offset and not self.done:
+                self._condition.wait()
+            return self.written, self.done
+
+    def read(self, offset, end):
+        """读取 [offset, end) 的字节；写完后临时文件会改名为输出文件，每次按当前位置打开"""
+        for path in (self.part_path, self.output_path, self.part_path, self.output_path):
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    return f.read(end - offset)
+            except FileNotFoundError:
+                continue
+        raise FileNotFoundError(self.output_path)
+
+# 正在进行的流式合成：结果键 -> StreamProgress，相同的流式请求直接跟读同一个文件
+active_streams = {}
+active_streams_lock = threading.Lock()
+
+def start_stream(text, speed, key, filename, output_path, on_done=None):
+    """
+    流式合成：在后台线程中按顺序逐块合成并写入临时文件，同时提前合成后面的块
+    合成进度与客户端读取无关，客户端读得慢、中途断开都不影响合成，也不会拖住等待同一结果的其他请求；
+    全部完成后改名为output_path并登记到输出索引，合成失败时删除临时文件并释放预留的文件名
+    结束时调用 on_done((文件名, 错误信息, False))，格式与 render_text 的返回值一致，失败时文件名为None
+    
+    返回:
+    - StreamProgress，用 tail_stream 逐块读出
+    """
+    part_path = output_path.with_name(f".{output_path.name}.part")
+    progress = StreamProgress(part_path, output_path)
+    # 先创建临时文件，响应开始读取时文件一定存在
+    open(part_path, 'wb').close()
+    with active_streams_lock:
+        active_streams[key] = progress
+    
+    def produce():
+        result = (None, '语音合成失败', False)
+        error = None
+        try:
+            with inflight.track():
+                tasks, boundaries = plan_chunks(text, speed <= 1)
+                if not tasks:
+                    raise ValueError('文本中没有可朗读的内容')
+                SEGMENTS_TOTAL.inc(len(tasks))
+                logger.info(f"流式合成: {len(tasks)} 个片段, 预读 {STREAM_READAHEAD} 个")
+                
+                chunks = render_chunks(tasks, boundaries, SPEED_FACTORS[speed], STREAM_READAHEAD + 1, SENTENCE_PAUSE_MS)
+                written = 0
+                try:
+                    with open(part_path, 'wb') as f:
+                        for data in chunks:
+                            f.write(data)
+                            f.flush()
+                            written += len(data)
+                            OUTPUT_BYTES_TOTAL.inc(len(data))
+                            progress.advance(written)
+                finally:
+                    chunks.close()
+                os.replace(part_path, output_path)
+                output_store.commit(filename, key, text, speed)
+                result = (filename, None, False)
+                logger.info(f"流式合成完成，音频文件已保存: {output_path}")
+        except Exception as e:
+            logger.error(f"流式合成失败: {str(e)}")
+            result = (None, f"语音合成失败: {str(e)}", False)
+            error = e
+        finally:
+            with active_streams_lock:
+                if active_streams.get(key) is progress:
+                    del active_streams[key]
+            if result[0] is None:
+                try:
+                    part_path.unlink()
+                except OSError:
+                    pass
+                output_store.release(filename)
+            progress.close(error)
+            if on_done is not None:
+                on_done(result)
+    
+    threading.Thread(target=produce, name='tts-stream', daemon=True).start()
+    return progress
+
+def tail_stream(progress):
+    """
+    逐块产出后台合成写入的MP3字节，直到合成结束
+    合成中途失败时在已产出的部分之后结束（状态码已经发出，无法再返回错误）
+    """
+    offset = 0
+    while True:
+        written, done = progress.wait(offset)
+        if written > offset:
+            try:
+                data = progress.read(offset, written)
+            except FileNotFoundError:
+                # 合成失败，临时文件已删除
+                return
+            offset += len(data)
+            yield data
+        elif done:
+            return
+
+def stream_response(progress, filename):
+    """
+    跟读流式合成的响应：等到第一块写入后再开始，合成在此之前失败时仍可以返回错误状态码
+    """
+    written, done = progress.wait(0)
+    if written == 0 and progress.error is not None:
+        status = 400 if isinstance(progress.error, ValueError) else 500
+        message = str(progress.error) if status == 400 else f'语音合成失败: {str(progress.error)}'
+        return jsonify({'error': message}), status
+    
+    response = Response(tail_stream(progress), mimetype='audio/mpeg')
+    response.headers['X-Audio-Url'] = quote(f"/output/{filename}")
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def send_stored_clip(filename):
+    """
+    返回流式接口复用已保存结果时的响应，地址见响应头 X-Audio-Url
+    同一文本的合成结果可能变化（如被淘汰后重新合成），只允许浏览器凭ETag验证后复用
+
+    返回:
+    - Response，filename为空或文件不存在时返回None
+    """
+    response = send_clip(filename, immutable=False) if filename else None
+    if response is not None:
+        response.headers['X-Audio-Url'] = quote(f"/output/{filename}")
+    return response
+
+def send_clip(filename, immutable=True):
+    """
+    返回输出文件的响应：内容哈希作为强ETag，支持条件请求（304）和Range请求（206）
+    小文件经内存缓存返回，大文件直接从磁盘发送
+    immutable为False时要求浏览器每次用ETag验证
+
+    返回:
+    - Response，文件不存在时返回None
+    """
+    info = output_store.describe(filename)
+    if info is None:
+        return None
+    
+    data = None
+    if hot_clips.accepts(info.size):
+        data = hot_clips.get(filename, info.etag)
+        if data is None:
+            try:
+                data = info.path.read_bytes()
+            except FileNotFoundError:
+                return None
+            hot_clips.put(filename, info.etag, data)
+    
+    if data is not None:
+        response = Response(data, mimetype='audio/mpeg')
+        response.set_etag(info.etag)
+        response.last_modified = info.created
+        response.cache_control.max_age = AUDIO_MAX_AGE
+        response.make_conditional(request, accept_ranges=True, complete_length=len(data))
+    else:
+        if not info.path.exists():
+            return None
+        response = send_file(info.path, mimetype='audio/mpeg', etag=info.etag,
+                             last_modified=info.created, max_age=AUDIO_MAX_AGE, conditional=True)
+    
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = None
+        response.cache_control.no_cache = True
+    return response
+
+def parse_speed(value):
+    """
+    解析语速参数 (0=最慢, 1=慢速, 2=正常, 3=快速, 4=最快)
+    """
+    if value not in [0, 1, 2, 3, 4]:
+        return 2  # 默认正常语速
+    return value
+
+def parse_synthesis_item(data):
+    """
+    解析单个合成请求：普通模式使用text，组合模式使用parts和gapMs
+    
+    返回:
+    - (文本, 语速, 组合部分列表或None, 静音间隔毫秒, 错误信息) 元组
+    """
+    speed = parse_speed(data.get('speed', 2))
+    parts = data.get('parts')
+    if parts is not None:
+        if not isinstance(parts, list) or not all(isinstance(p, str) for p in parts):
+            return None, speed, None, 0, 'parts必须是字符串列表'
+        parts = [p.strip() for p in parts if p.strip()]
+        if not parts:
+            return None, speed, None, 0, '文本不能为空'
+        gap_ms = data.get('gapMs', 0)
+        if not isinstance(gap_ms, int) or not 0 <= gap_ms <= 5000:
+            return None, speed, None, 0, 'gapMs必须是0~5000之间的整数'
+        return ''.join(parts), speed, parts, gap_ms, None
+    
+    text = data.get('text')
+    if not isinstance(text, str) or not text.strip():
+        return None, speed, None, 0, '文本不能为空'
+    return text.strip(), speed, None, 0, None
+
+# 批量合成线程池：与片段引擎分开，避免批量任务占满片段线程导致互相等待
+BATCH_WORKERS = int(os.environ.get('TTS_BATCH_WORKERS', '4'))
+BATCH_MAX_ITEMS = int(os.environ.get('TTS_BATCH_MAX_ITEMS', '500'))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='tts-batch')
+
+# 异步任务队列：长文本提交后立即返回任务ID，由后台线程按优先级合成
+# 任务状态写入输出索引，多进程部署时任一工作进程都能查询
+JOB_WORKERS = int(os.environ.get('TTS_JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.environ.get('TTS_JOB_QUEUE_SIZE', '100'))
+JOB_RETENTION = int(os.environ.get('TTS_JOB_RETENTION', '3600'))
+job_queue = JobQueue(workers=JOB_WORKERS, max_pending=JOB_QUEUE_SIZE, retention=JOB_RETENTION, store=output_store)
+registry.gauge('tts_jobs_queued', '排队中的异步任务数', lambda: job_queue.pending)
+registry.gauge('tts_jobs_rejected_total', '队列已满被拒绝的异步任务数', lambda: job_queue.rejected, 'counter')
+
+# 正在进行的合成任务，退出前等待其完成
+inflight = InFlightTracker()
+
+# 启动时预热：从词表提前合成片段缓存，限速并在有正常请求时让路
+WARMUP_FILE = os.environ.get('TTS_WARMUP_FILE')
+WARMUP_COLUMNS = os.environ.get('TTS_WARMUP_COLUMNS', 'C,J').split(',')
+WARMUP_WORKERS = int(os.environ.get('TTS_WARMUP_WORKERS', '2'))
+WARMUP_RATE = float(os.environ.get('TTS_WARMUP_RATE', '2'))
+WARMUP_SPEEDS = [int(speed) for speed in os.environ.get('TTS_WARMUP_SPEEDS', '2').split(',')]
+warmup = None
+warmup_lock = threading.Lock()
+
+def start_warmup():
+    """
+    在后台线程中预热；多个工作进程时只由拿到锁文件的一个进程执行
+    """
+    global warmup
+    with warmup_lock:
+        if not WARMUP_FILE or warmup is not None:
+            return
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        lock_file = None
+        if fcntl is not None:
+            lock_file = open(SEGMENT_CACHE_DIR / '.warmup.lock', 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                logger.info("其他工作进程正在预热，跳过")
+                return
         
-    except ImportError:
-        # 如果没有pydub，使用简单的文件连接（可能有问题）
-        logger.warning("未安装pydub，使用简单文件连接，可能影响音质")
-        with open(output_path, 'wb') as outfile:
-            for audio_file in audio_files:
-                with open(audio_file, 'rb') as infile:
-                    outfile.write(infile.read())
-
-@app.route('/')
+        warmup = create_warmup(sys.modules[__name__], workers=WARMUP_WORKERS, rate=WARMUP_RATE,
+                               speeds=WARMUP_SPEEDS, busy=lambda: inflight.count)
+    
+    def run():
+        logger.info(f"开始预热: {WARMUP_FILE}")
+        try:
+            report = warmup.run(iter_terms(WARMUP_FILE, WARMUP_COLUMNS))
+            logger.info(f"预热完成: {report}")
+        except Exception as e:
+            logger.error(f"预热失败: {e}")
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+    
+    threading.Thread(target=run, name='warmup', daemon=True).start()
+
+def drain(timeout=None):
+    """
+    等待进行中的合成完成并关闭线程池，服务退出前调用
+    """
+    job_queue.close()
+    if warmup is not None:
+        warmup.stop()
+    if inflight.count:
+        logger.info(f"等待 {inflight.count} 个进行中的合成完成...")
+    if not inflight.wait_idle(timeout):
+        logger.warning(f"等待超时，仍有 {inflight.count} 个合成未完成")
+    maintenance.stop()
+    batch_executor.shutdown(wait=False, cancel_futures=True)
+    synthesis_engine.shutdown(wait=False)
+
+def create_app():
+    """
+    应用工厂：创建Flask应用并注册接口
+    每个工作进程各自调用一次
+    """
+    app = Flask(__name__)
+    CORS(app)  # 启用跨域支持
+    
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    maintenance.start()
+    start_warmup()
+    
+    # 支持的语言
+    app.config['SUPPORTED_LANGUAGES'] = {
+        'zh': '中文',
+        'en': '英文',
+        'zh-CN': '中文（简体）',
+        'zh-TW': '中文（繁体）',
+        'en-US': '英文（美国）',
+        'en-GB': '英文（英国）'
+    }
+    
+    app.register_blueprint(api)
+    return app
+
+@api.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@api.after_request
+def record_request_metrics(response):
+    """记录接口请求数和耗时"""
+    started = getattr(g, 'request_started', None)
+    endpoint = request.endpoint.rsplit('.', 1)[-1] if request.endpoint else None
+    if started is not None and endpoint and endpoint != 'metrics':
+        REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(response.status_code))
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+@api.route('/')
 def index():
     """提供前端页面"""
     return send_from_directory('.', 'index.html')
 
-@app.route('/api/synthesize', methods=['POST'])
+@api.route('/api/synthesize', methods=['POST'])
 def synthesize():
     """
     文本转语音API接口
@@ -304,56 +919,249 @@ def synthesize():
     try:
         # 获取请求数据
         data = request.get_json()
-        if not data or 'text' not in data:
+        if not data or ('text' not in data and 'parts' not in data):
             return jsonify({'error': '缺少文本参数'}), 400
         
-        text = data['text'].strip()
-        if not text:
-            return jsonify({'error': '文本不能为空'}), 400
+        # 获取文本和语速参数 (0=最慢, 1=慢速, 2=正常, 3=快速, 4=最快)
+        text, speed, parts, gap_ms, error_msg = parse_synthesis_item(data)
+        if error_msg:
+            return jsonify({'error': error_msg}), 400
         
-        # 获取语速参数 (0=最慢, 1=慢速, 2=正常, 3=快速, 4=最快)
-        speed = data.get('speed', 2)
-        if speed not in [0, 1, 2, 3, 4]:
-            speed = 2  # 默认正常语速
-        
-        # 使用标准成人播音，不再需要音色参数
-        
-        # 生成基于文本内容的文件名
-        base_filename = sanitize_filename(text)
-        filename = f"{base_filename}.mp3"
-        output_path = OUTPUT_DIR / filename
-        
-        # 如果文件已存在，添加序号
-        counter = 1
-        while output_path.exists():
-            filename = f"{base_filename}_{counter}.mp3"
-            output_path = OUTPUT_DIR / filename
-            counter += 1
+        if data.get('async'):
+            return submit_job(text, speed, data.get('filename'), parts, gap_ms, data.get('priority', 0))
         
         logger.info(f"开始合成语音: {text[:50]}... (语速:{['最慢','慢速','正常','快速','最快'][speed]}, 标准播音)")
         
-        # 执行语音合成
-        success, error_msg = text_to_speech(text, output_path, speed)
+        # 请求中带 "timing": true 时返回分阶段耗时明细
+        timing_token = start_request_timing() if data.get('timing') else None
         
-        if success:
+        # 执行语音合成，相同请求直接复用已生成的文件
+        try:
+            filename, error_msg, cached = render_text(text, speed, data.get('filename'), parts, gap_ms)
+        finally:
+            timings = finish_request_timing(timing_token) if timing_token else None
+        
+        if filename:
             # 返回音频文件URL
             audio_url = f"/output/{filename}"
-            logger.info(f"语音合成成功: {audio_url}")
+            logger.info(f"语音合成成功: {audio_url}{' (复用)' if cached else ''}")
             
-            return jsonify({
+            result = {
                 'success': True,
                 'audioUrl': audio_url,
                 'filename': filename,
-                'text': text
-            })
+                'text': text,
+                'cached': cached
+            }
+            if timings is not None:
+                result['timings'] = timings
+            return jsonify(result)
         else:
-            return jsonify({'error': error_msg}), 500
+            result = {'error': error_msg}
+            if timings is not None:
+                result['timings'] = timings
+            return jsonify(result), 500
             
     except Exception as e:
         logger.error(f"API处理错误: {str(e)}")
         return jsonify({'error': f'服务器错误: {str(e)}'}), 500
 
-@app.route('/output/<filename>')
+def submit_job(text, speed, preferred_name, parts, gap_ms, priority):
+    """
+    提交异步合成任务，立即返回任务ID；队列已满时返回429
+    """
+    try:
+        priority = int(priority)
+    except (TypeError, ValueError):
+        return jsonify({'error': '优先级必须是整数'}), 400
+    
+    def run(job):
+        logger.info(f"开始异步合成 {job.id}: {text[:50]}...")
+        filename, error_msg, cached = render_text(text, speed, preferred_name, parts, gap_ms, job.set_progress)
+        if not filename:
+            raise RuntimeError(error_msg)
+        return {'audioUrl': f"/output/{filename}", 'filename': filename, 'text': text, 'cached': cached}
+    
+    try:
+        job = job_queue.submit(run, priority)
+    except QueueFullError as e:
+        response = jsonify({'error': f'服务繁忙: {str(e)}'})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    
+    return jsonify({
+        'success': True,
+        'jobId': job.id,
+        'status': job.status,
+        'statusUrl': f"/api/jobs/{job.id}"
+    }), 202
+
+@api.route('/api/jobs', methods=['GET'])
+def job_stats():
+    """
+    异步任务队列统计
+    """
+    return jsonify(job_queue.stats())
+
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    查询异步任务的状态、进度（已完成片段数 / 片段总数）和完成后的audioUrl
+    """
+    result = job_queue.status(job_id)
+    if result is None:
+        return jsonify({'error': '任务不存在或已过期'}), 404
+    return jsonify(result)
+
+@api.route('/api/synthesize/batch', methods=['POST'])
+def synthesize_batch():
+    """
+    批量文本转语音API接口
+    请求体: {"items": [{"text": "...", "speed": 2, "filename": "可选.mp3"}, ...]}
+    以NDJSON逐行返回每一项的结果，先完成的先返回；相同的 (文本, 语速) 只合成一次
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': '缺少items参数'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'单次最多 {BATCH_MAX_ITEMS} 项'}), 400
+    
+    # 按结果键分组，相同内容只提交一次
+    invalid = []
+    groups = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            invalid.append((index, '无效的请求项'))
+            continue
+        text, speed, parts, gap_ms, error_msg = parse_synthesis_item(item)
+        if error_msg:
+            invalid.append((index, error_msg))
+            continue
+        if parts:
+            key = make_compose_key(parts, gap_ms, speed, TTS_BACKEND)
+        else:
+            key = make_result_key(text, speed, TTS_BACKEND)
+        if key not in groups:
+            groups[key] = {
+                'text': text, 'speed': speed, 'filename': item.get('filename'),
+                'parts': parts, 'gapMs': gap_ms, 'indexes': []
+            }
+        groups[key]['indexes'].append(index)
+    
+    logger.info(f"批量合成: {len(items)} 项, 去重后 {len(groups)} 项")
+    
+    futures = {
+        batch_executor.submit(
+            render_text, group['text'], group['speed'], group['filename'], group['parts'], group['gapMs']
+        ): key
+        for key, group in groups.items()
+    }
+    
+    def generate():
+        succeeded = 0
+        failed = len(invalid)
+        for index, error_msg in invalid:
+            yield json.dumps({'index': index, 'success': False, 'error': error_msg}, ensure_ascii=False) + '\n'
+        
+        for future in as_completed(futures):
+            group = groups[futures[future]]
+            try:
+                filename, error_msg, cached = future.result()
+            except Exception as e:
+                filename, error_msg, cached = None, f'服务器错误: {str(e)}', False
+            
+            for index in group['indexes']:
+                if filename:
+                    succeeded += 1
+                    result = {
+                        'index': index,
+                        'success': True,
+                        'audioUrl': f"/output/{filename}",
+                        'filename': filename,
+                        'text': group['text'],
+                        'cached': cached
+                    }
+                else:
+                    failed += 1
+                    result = {'index': index, 'success': False, 'error': error_msg}
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        
+        yield json.dumps({'done': True, 'total': len(items), 'succeeded': succeeded, 'failed': failed}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@api.route('/api/synthesize/stream', methods=['GET', 'POST'])
+def synthesize_stream():
+    """
+    流式文本转语音接口
+    GET /api/synthesize/stream?text=...&speed=2 可直接作为 <audio> 的src，合成完第一块即开始播放
+    以分块传输逐块返回MP3帧，完整音频最后保存到输出目录，响应头 X-Audio-Url 为其地址（URL编码）
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args.to_dict()
+        try:
+            data['speed'] = int(data.get('speed', 2))
+        except ValueError:
+            data['speed'] = 2
+    if 'parts' in data:
+        return jsonify({'error': '流式接口不支持组合模式'}), 400
+    
+    text, speed, _, _, error_msg = parse_synthesis_item(data)
+    if error_msg:
+        return jsonify({'error': error_msg}), 400
+    
+    # 已合成过的文本直接返回文件
+    key = make_result_key(text, speed, TTS_BACKEND)
+    response = send_stored_clip(output_store.lookup(key))
+    if response is not None:
+        RESULT_LOOKUPS_TOTAL.inc(result='hit')
+        return response
+    RESULT_LOOKUPS_TOTAL.inc(result='miss')
+    
+    # 相同的请求（<audio>会重复请求同一地址，或同一文本正在由其他接口合成）只合成一次：
+    # 流式合成中的请求直接跟读同一个文件，其余情况等待合成完成后返回保存的文件
+    call, leader = single_flight.begin(key)
+    if not leader:
+        with active_streams_lock:
+            progress = active_streams.get(key)
+        if progress is not None:
+            return stream_response(progress, progress.output_path.name)
+        try:
+            with inflight.track():
+                filename, error_msg, _ = call.wait()
+        except Exception as e:
+            filename, error_msg = None, f'语音合成失败: {str(e)}'
+        response = send_stored_clip(filename)
+        if response is None:
+            return jsonify({'error': error_msg or '音频文件不存在'}), 500
+        return response
+    
+    def finish(result):
+        single_flight.finish(key, call, result)
+    
+    try:
+        # 等待期间可能已有其他请求完成了合成
+        existing = output_store.lookup(key)
+        response = send_stored_clip(existing)
+        if response is not None:
+            finish((existing, None, True))
+            return response
+        filename, output_path = allocate_output_path(text, data.get('filename'))
+    except Exception as e:
+        single_flight.finish(key, call, error=e)
+        raise
+    try:
+        progress = start_stream(text, speed, key, filename, output_path, on_done=finish)
+    except Exception as e:
+        output_store.release(filename)
+        single_flight.finish(key, call, error=e)
+        raise
+    return stream_response(progress, filename)
+
+@api.route('/output/<filename>')
 def serve_audio(filename):
     """
     提供音频文件服务
@@ -363,67 +1171,117 @@ def serve_audio(filename):
         if not filename.endswith('.mp3'):
             return jsonify({'error': '不支持的文件类型'}), 400
         
-        # 检查文件是否存在
-        file_path = OUTPUT_DIR / filename
-        if not file_path.exists():
+        # 通过输出索引找到文件所在的分目录
+        response = send_clip(filename)
+        if response is None:
             return jsonify({'error': '音频文件不存在'}), 404
+        # 记录访问时间，后台维护按最近访问淘汰
+        output_store.touch(filename)
         
-        return send_from_directory(OUTPUT_DIR, filename)
+        return response
         
     except Exception as e:
         logger.error(f"文件服务错误: {str(e)}")
         return jsonify({'error': '文件服务错误'}), 500
 
-@app.route('/api/languages', methods=['GET'])
+@api.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    获取片段缓存命中统计
+    """
+    return jsonify(segment_cache.stats())
+
+@api.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus格式的运行指标：请求数与耗时、各阶段耗时直方图、片段数、输出字节数、缓存命中
+    """
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/api/languages', methods=['GET'])
 def get_languages():
     """
     获取支持的语言列表
     """
-    return jsonify(SUPPORTED_LANGUAGES)
+    return jsonify(current_app.config['SUPPORTED_LANGUAGES'])
 
-@app.route('/api/cleanup', methods=['POST'])
+@api.route('/api/output/stats', methods=['GET'])
+def output_stats():
+    """
+    获取输出目录占用和后台维护统计
+    """
+    return jsonify({**output_store.stats(), 'maintenance': maintenance.stats(), 'hotClips': hot_clips.stats()})
+
+@api.route('/api/warmup', methods=['GET'])
+def warmup_status():
+    """
+    获取预热进度和覆盖率
+    """
+    if warmup is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'file': WARMUP_FILE, **warmup.report.to_dict()})
+
+@api.route('/api/cleanup', methods=['POST'])
 def cleanup():
     """
-    清理旧的音频文件（可选功能）
+    请求后台维护立即清理旧的音频文件，不等待完成
+    默认清理24小时内未被访问的文件，可通过 maxAgeHours 指定
     """
+    data = request.get_json(silent=True) or {}
     try:
-        # 清理24小时前的文件
-        import time
-        current_time = time.time()
-        cleaned_count = 0
-        
-        for audio_file in OUTPUT_DIR.glob('*.mp3'):
-            file_age = current_time - audio_file.stat().st_mtime
-            if file_age > 24 * 3600:  # 24小时
-                audio_file.unlink()
-                cleaned_count += 1
-        
-        logger.info(f"清理了 {cleaned_count} 个旧音频文件")
-        return jsonify({'cleaned': cleaned_count})
-        
-    except Exception as e:
-        logger.error(f"清理错误: {str(e)}")
-        return jsonify({'error': '清理失败'}), 500
+        max_age_hours = float(data.get('maxAgeHours', 24))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'maxAgeHours 必须是数字'}), 400
+    if max_age_hours < 0:
+        return jsonify({'error': 'maxAgeHours 不能为负数'}), 400
+    
+    maintenance.trigger(max_age=max_age_hours * 3600)
+    logger.info(f"已请求清理 {max_age_hours} 小时内未被访问的音频文件")
+    return jsonify({'scheduled': True, 'maxAgeHours': max_age_hours, 'statsUrl': '/api/output/stats'}), 202
+
+def parse_args():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='文本转语音服务器')
+    parser.add_argument('--host', default=os.environ.get('TTS_HOST', '0.0.0.0'), help='监听地址')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('TTS_PORT', '8080')), help='监听端口')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('TTS_WORKERS', '1')),
+                        help='工作进程数（需要gunicorn）')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('TTS_THREADS', '8')),
+                        help='每个进程的线程数')
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('TTS_GRACEFUL_TIMEOUT', '30')),
+                        help='退出时等待进行中合成的最长时间（秒）')
+    parser.add_argument('--headless', action='store_true', default=os.environ.get('TTS_HEADLESS') == '1',
+                        help='不自动打开浏览器')
+    parser.add_argument('--dev', action='store_true', help='使用Flask开发服务器（单进程，仅用于调试）')
+    return parser.parse_args()
 
 if __name__ == '__main__':
+    args = parse_args()
+    
     print("🎤 文本转语音服务器启动中...")
     print(f"📁 音频输出目录: {OUTPUT_DIR.absolute()}")
-    print(f"🌐 服务器地址: http://localhost:8080")
+    print(f"🗃️ 片段缓存目录: {SEGMENT_CACHE_DIR.absolute()}")
+    print(f"🔊 语音合成后端: {TTS_BACKEND}")
+    print(f"🌐 服务器地址: http://localhost:{args.port}")
     print("📝 支持的格式: 中文、英文、中英文混合")
     print("🔄 按 Ctrl+C 停止服务器")
     
-    # 启动Flask服务器
-    import threading
-    import webbrowser
-    
-    # 延迟打开浏览器
-    def open_browser():
-        time.sleep(2)
-        webbrowser.open('http://localhost:8080')
-    
-    # 启动浏览器线程
-    browser_thread = threading.Thread(target=open_browser)
-    browser_thread.daemon = True
-    browser_thread.start()
+    if not args.headless:
+        import webbrowser
+        
+        # 延迟打开浏览器
+        def open_browser():
+            time.sleep(2)
+            webbrowser.open(f'http://localhost:{args.port}')
+        
+        # 启动浏览器线程
+        browser_thread = threading.Thread(target=open_browser)
+        browser_thread.daemon = True
+        browser_thread.start()
     
-    app.run(host='0.0.0.0', port=8080, debug=False, use_reloader=False)
\ No newline at end of file
+    if args.dev:
+        create_app().run(host=args.host, port=args.port, debug=False, use_reloader=False)
+    else:
+        serve(create_app, host=args.host, port=args.port, workers=args.workers, threads=args.threads,
+              graceful_timeout=args.graceful_timeout, on_exit=drain)
\ No newline at end of file
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境服务
+- 安装了gunicorn时使用多进程 + 多线程（gthread）运行，进程数和每进程线程数可配置
+- 未安装gunicorn（如Windows）时退回到多线程的WSGI服务器
+收到 SIGTERM/SIGINT 后停止接收新请求，等待正在进行的合成完成后再退出
+"""
+
+import signal
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightTracker:
+    """
+    记录正在进行的合成任务数，退出前等待其全部完成
+
+        with tracker.track():
+            ...
+    """
+
+    def __init__(self):
+        self._count = 0
+        self._condition = threading.Condition()
+
+    def track(self):
+        return _Tracked(self)
+
+    def _enter(self):
+        with self._condition:
+            self._count += 1
+
+    def _exit(self):
+        with self._condition:
+            self._count -= 1
+            if self._count == 0:
+                self._condition.notify_all()
+
+    @property
+    def count(self):
+        with self._condition:
+            return self._count
+
+    def wait_idle(self, timeout=None):
+        """
+        等待所有任务完成
+
+        返回:
+        - 超时前全部完成返回True，否则返回False
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._count == 0, timeout=timeout)
+
+
+class _Tracked:
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def __enter__(self):
+        self.tracker._enter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracker._exit()
+        return False
+
+
+def gunicorn_available():
+    try:
+        import gunicorn.app.base  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_gunicorn(app_factory, host, port, workers, threads, graceful_timeout, on_exit=None):
+    """
+    使用gunicorn运行应用
+
+    参数:
+    - app_factory: 应用工厂，每个工作进程调用一次
+    - workers: 工作进程数
+    - threads: 每个进程的线程数
+    - graceful_timeout: 收到退出信号后等待进行中请求的最长时间（秒）
+    - on_exit: 工作进程退出前调用，用于等待后台合成任务完成
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class TTSApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                'bind': f"{host}:{port}",
+                'workers': workers,
+                'threads': threads,
+                'worker_class': 'gthread',
+                'graceful_timeout': graceful_timeout,
+                # 单次合成可能较慢，工作进程心跳超时需要留足时间
+                'timeout': max(120, graceful_timeout * 2),
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+            if on_exit is not None:
+                self.cfg.set('worker_exit', lambda server, worker: on_exit(graceful_timeout))
+
+        def load(self):
+            return app_factory()
+
+    TTSApplication().run()
+
+
+def run_threaded(app, host, port, graceful_timeout, on_exit=None):
+    """
+    使用多线程WSGI服务器运行应用（单进程）
+    收到退出信号后停止接收新请求，并等待进行中的合成完成
+    """
+    from werkzeug.serving import make_server
+
+    http_server = make_server(host, port, app, threaded=True)
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+        logger.info("收到退出信号，停止接收新请求")
+        # shutdown 会阻塞到 serve_forever 退出，不能在其所在线程中直接调用
+        threading.Thread(target=http_server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info(f"多线程服务器已启动: http://{host}:{port}")
+    try:
+        http_server.serve_forever()
+    finally:
+        if on_exit is not None:
+            on_exit(graceful_timeout)
+        http_server.server_close()
+
+
+def serve(app_factory, host='0.0.0.0', port=8080, workers=1, threads=8, graceful_timeout=30, on_exit=None):
+    """
+    按环境选择服务方式运行应用
+    """
+    if gunicorn_available():
+        logger.info(f"使用gunicorn: {workers} 个进程 x {threads} 个线程")
+        run_gunicorn(app_factory, host, port, workers, threads, graceful_timeout, on_exit)
+    else:
+        if workers > 1:
+            logger.warning("未安装gunicorn，忽略进程数设置，使用单进程多线程服务器")
+        run_threaded(app_factory(), host, port, graceful_timeout, on_exit)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表格逐行读取
+按列字母（如 C、J）逐行读取 xlsx / csv / parquet / txt，不把整张表载入内存
+- xlsx: openpyxl 只读模式，只解析需要的列范围
+- csv: 第一行为表头
+- parquet: 按列位置取列，只读取需要的列，分批解码（需要pyarrow）
+- txt: 每行一个词，忽略列设置
+"""
+
+import csv
+import os
+
+
+def column_index(letter):
+    """列字母 -> 从0开始的列号，例如 A -> 0, J -> 9, AA -> 26"""
+    index = 0
+    for char in letter.strip().upper():
+        if not 'A' <= char <= 'Z':
+            raise ValueError(f"无效的列名: {letter}")
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def iter_rows(path, columns):
+    """
+    逐行读取指定列
+
+    参数:
+    - path: 表格路径（.xlsx / .csv / .parquet / .txt）
+    - columns: 列字母列表，如 ['C', 'J']
+
+    返回:
+    - 生成器，依次产出 (数据行号, (各列的值...))，数据行号从1开始（不含表头）
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        return _iter_xlsx(path, columns)
+    if extension == '.csv':
+        return _iter_csv(path, columns)
+    if extension == '.parquet':
+        return _iter_parquet(path, columns)
+    if extension == '.txt':
+        return _iter_txt(path)
+    raise ValueError(f"不支持的文件类型: {extension}（支持 xlsx、csv、parquet、txt）")
+
+
+def count_rows(path):
+    """
+    估算表格的数据行数（不含表头），用于显示进度，不逐行解析内容
+
+    - xlsx: 工作表记录的尺寸（openpyxl的max_row）
+    - csv / txt: 换行符数量（csv单元格内的换行会多算）
+    - parquet: 文件元数据中的行数
+
+    返回:
+    - 行数，无法估算时返回None
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    try:
+        if extension in ('.xlsx', '.xlsm'):
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(path, read_only=True)
+            try:
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max(0, max_row - 1) if max_row else None
+        if extension in ('.csv', '.txt'):
+            lines = _count_lines(path)
+            return max(0, lines - 1) if extension == '.csv' else lines
+        if extension == '.parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetFile(path).metadata.num_rows
+    except (ImportError, OSError):
+        return None
+    return None
+
+
+def _count_lines(path, chunk_size=1 << 20):
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    # 最后一行没有换行符时也算一行
+    return lines + (last != b'\n')
+
+
+def _pick(row, indexes):
+    return tuple(row[i] if i < len(row) else None for i in indexes)
+
+
+def _iter_xlsx(path, columns):
+    from openpyxl import load_workbook
+
+    indexes = [column_index(column) for column in columns]
+    first = min(indexes)
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(min_row=2, min_col=first + 1, max_col=max(indexes) + 1, values_only=True)
+        for number, row in enumerate(rows, 1):
+            yield number, _pick(row, [i - first for i in indexes])
+    finally:
+        workbook.close()
+
+
+def _iter_csv(path, columns):
+    indexes = [column_index(column) for column in columns]
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for number, row in enumerate(reader, 1):
+            yield number, _pick(row, indexes)
+
+
+def _iter_parquet(path, columns, batch_size=1024):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("读取parquet文件需要安装pyarrow: pip install pyarrow")
+
+    parquet_file = pq.ParquetFile(path)
+    names = parquet_file.schema_arrow.names
+    selected = []
+    for column in columns:
+        index = column_index(column)
+        if index >= len(names):
+            raise ValueError(f"parquet文件只有 {len(names)} 列，没有 {column} 列")
+        selected.append(names[index])
+
+    number = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=list(dict.fromkeys(selected))):
+        data = batch.to_pydict()
+        for values in zip(*(data[name] for name in selected)):
+            number += 1
+            yield number, values
+
+
+def _iter_txt(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for number, line in enumerate(f, 1):
+            yield number, (line.strip(),)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+片段并行合成引擎
+使用有界线程池同时请求多个片段，结果按原顺序返回
+"""
+
+import logging
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentTimeoutError(Exception):
+    """片段合成超时"""
+
+
+class SynthesisEngine:
+    """
+    片段并行合成引擎
+
+    参数:
+    - synthesize: 片段合成函数 synthesize(text, lang, tld, slow) -> bytes
+    - max_workers: 最大并发数
+    - segment_timeout: 片段的超时时间（秒），从提交到线程池时开始计算（包含排队时间），None表示不限制
+    """
+
+    def __init__(self, synthesize, max_workers=4, segment_timeout=30):
+        self.synthesize = synthesize
+        self.max_workers = max_workers
+        self.segment_timeout = segment_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts-segment')
+
+    def submit(self, text, lang, tld, slow):
+        """提交单个片段，返回Future；工作线程沿用调用方的上下文（请求耗时明细等）"""
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self.synthesize, text, lang, tld, slow)
+
+    def synthesize_all(self, segments, progress=None):
+        """
+        并行合成多个片段
+        所有片段同时提交，每个片段的截止时间为提交时刻加 segment_timeout，
+        因此整个请求最多等待 segment_timeout 秒（而不是片段数倍）。
+        超时只会取消尚未开始的片段；已在运行的片段不会被中断，完成后结果仍会写入片段缓存
+
+        参数:
+        - segments: [(文本, 语言, TLD, slow), ...]
+        - progress: 进度回调 progress(已完成数, 总数)，每完成一个片段调用一次
+
+        返回:
+        - 与segments顺序一致的音频字节列表
+        """
+        total = len(segments)
+        if progress is not None:
+            progress(0, total)
+
+        if total == 1 and self.segment_timeout is None:
+            # 不限时的单个片段无需经过线程池；限时时与多个片段一样经线程池等待，同样受截止时间约束
+            result = self.synthesize(*segments[0])
+            if progress is not None:
+                progress(1, 1)
+            return [result]
+
+        futures = [self.submit(*segment) for segment in segments]
+        deadline = None if self.segment_timeout is None else time.monotonic() + self.segment_timeout
+        if progress is not None:
+            lock = threading.Lock()
+            completed = [0]
+
+            def on_done(future):
+                if future.cancelled() or future.exception() is not None:
+                    return
+                with lock:
+                    completed[0] += 1
+                    progress(completed[0], total)
+
+            for future in futures:
+                future.add_done_callback(on_done)
+        results = []
+        try:
+            for i, future in enumerate(futures):
+                started = time.monotonic()
+                remaining = None if deadline is None else max(0.0, deadline - started)
+                try:
+                    results.append(future.result(timeout=remaining))
+                except FutureTimeoutError:
+                    raise SegmentTimeoutError(
+                        f"片段 {i+1} 合成超时（{self.segment_timeout}秒）: {segments[i][0][:20]}"
+                    )
+                logger.debug(f"片段 {i+1} 完成，等待 {time.monotonic() - started:.2f}s")
+        except Exception:
+            # 出错时取消尚未开始的片段
+            for future in futures:
+                future.cancel()
+            raise
+        return results
+
+    def shutdown(self, wait=True):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait)
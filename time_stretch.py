@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+保持音调的变速（WSOLA）
+直接在PCM数组上做波形相似重叠相加：按语速倍率跳跃读取输入帧，
+在容差范围内搜索与上一帧自然延续最相似的位置，再以固定步长重叠相加输出
+支持分块输入，长音频的内存占用与输入长度无关
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 粗搜索时的降采样倍数：先在降采样信号上找大致位置，再在原信号上细化
+SEARCH_DECIMATION = 4
+
+
+class WSOLAStretcher:
+    """
+    流式WSOLA变速器
+
+    参数:
+    - speed_factor: 语速倍率，大于1加快，小于1放慢，输出时长 = 输入时长 / speed_factor
+    - sample_rate: 采样率
+    - frame_ms: 分析帧长度（毫秒）
+    - tolerance_ms: 相似度搜索容差（毫秒）
+    """
+
+    def __init__(self, speed_factor, sample_rate, frame_ms=40, tolerance_ms=10):
+        if speed_factor <= 0:
+            raise ValueError("speed_factor必须大于0")
+        self.speed_factor = speed_factor
+        self.frame_len = int(sample_rate * frame_ms / 1000) // 2 * 2
+        self.syn_hop = self.frame_len // 2
+        self.ana_hop = self.syn_hop * speed_factor
+        self.tolerance = int(sample_rate * tolerance_ms / 1000)
+        self.window = np.hanning(self.frame_len).astype(np.float32)
+
+        # 输入缓冲区（前面补tolerance个零，坐标均以补零后的输入为准）
+        self._input = np.zeros(self.tolerance, dtype=np.float32)
+        self._input_start = 0
+        self._input_received = 0
+        # 输出累加缓冲区及窗函数累加值
+        self._output = np.zeros(0, dtype=np.float32)
+        self._weights = np.zeros(0, dtype=np.float32)
+        self._output_start = 0
+        self._frame = 0
+        self._delta = 0
+
+    def _input_end(self):
+        return self._input_start + len(self._input)
+
+    def _read(self, start, length):
+        offset = start - self._input_start
+        return self._input[offset:offset + length]
+
+    def _frame_requirement(self, k):
+        """处理第k帧需要的输入结束位置"""
+        ana = int(round(k * self.ana_hop)) + self.tolerance + self._delta
+        next_center = int(round((k + 1) * self.ana_hop))
+        return max(ana + self.syn_hop + self.frame_len, next_center + self.frame_len + 2 * self.tolerance)
+
+    def _best_delta(self, natural, region):
+        """
+        返回region中与natural互相关最大的偏移
+        先在降采样信号上粗搜索，再在原信号的邻域内精确比较
+        """
+        step = SEARCH_DECIMATION
+        coarse = sliding_window_view(region[::step], len(natural[::step])) @ natural[::step]
+        center = int(np.argmax(coarse)) * step
+
+        low = max(0, center - step + 1)
+        high = min(2 * self.tolerance, center + step - 1)
+        fine = sliding_window_view(region[low:high + self.frame_len], self.frame_len) @ natural
+        return low + int(np.argmax(fine)) - self.tolerance
+
+    def _process_frame(self):
+        k = self._frame
+        ana = int(round(k * self.ana_hop)) + self.tolerance + self._delta
+        syn = k * self.syn_hop
+
+        # 重叠相加当前帧
+        end = syn + self.frame_len - self._output_start
+        if end > len(self._output):
+            grow = end - len(self._output)
+            self._output = np.concatenate([self._output, np.zeros(grow, dtype=np.float32)])
+            self._weights = np.concatenate([self._weights, np.zeros(grow, dtype=np.float32)])
+        offset = syn - self._output_start
+        self._output[offset:offset + self.frame_len] += self._read(ana, self.frame_len) * self.window
+        self._weights[offset:offset + self.frame_len] += self.window
+
+        # 在下一帧的容差范围内寻找与当前帧自然延续最相似的位置
+        natural = self._read(ana + self.syn_hop, self.frame_len)
+        next_center = int(round((k + 1) * self.ana_hop))
+        region = self._read(next_center, self.frame_len + 2 * self.tolerance)
+        self._delta = self._best_delta(natural, region)
+        self._frame += 1
+
+    def _drain(self, final_length=None):
+        """输出已不会再被后续帧修改的样本"""
+        ready = self._frame * self.syn_hop - self._output_start
+        if final_length is not None:
+            ready = final_length - self._output_start
+        ready = max(0, min(ready, len(self._output)))
+
+        weights = self._weights[:ready]
+        out = self._output[:ready] / np.where(weights > 1e-3, weights, 1.0)
+        self._output = self._output[ready:]
+        self._weights = self._weights[ready:]
+        self._output_start += ready
+
+        # 丢弃后续帧不再需要的输入
+        keep_from = int(round(self._frame * self.ana_hop))
+        drop = keep_from - self._input_start
+        if drop > 0:
+            self._input = self._input[drop:]
+            self._input_start = keep_from
+        return out
+
+    def process(self, samples):
+        """
+        输入一块浮点样本，返回已完成的输出样本
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        self._input = np.concatenate([self._input, samples])
+        self._input_received += len(samples)
+        while self._frame_requirement(self._frame) <= self._input_end():
+            self._process_frame()
+        return self._drain()
+
+    def flush(self):
+        """
+        输入结束，返回剩余的输出样本
+        """
+        target_length = int(round(self._input_received / self.speed_factor))
+        while self._frame * self.syn_hop < target_length:
+            shortage = self._frame_requirement(self._frame) - self._input_end()
+            if shortage > 0:
+                self._input = np.concatenate([self._input, np.zeros(shortage, dtype=np.float32)])
+            self._process_frame()
+        return self._drain(final_length=target_length)
+
+
+def stretch(samples, speed_factor, sample_rate, chunk_size=1 << 16):
+    """
+    对单声道浮点样本做保持音调的变速，按块处理以限制内存
+
+    返回:
+    - 变速后的float32样本
+    """
+    if speed_factor == 1.0:
+        return np.asarray(samples, dtype=np.float32)
+
+    stretcher = WSOLAStretcher(speed_factor, sample_rate)
+    pieces = []
+    for start in range(0, len(samples), chunk_size):
+        pieces.append(stretcher.process(samples[start:start + chunk_size]))
+    pieces.append(stretcher.flush())
+    return np.concatenate(pieces)
+
+
+def stretch_pcm16(pcm, speed_factor, sample_rate, channels=1):
+    """
+    对16位PCM字节做保持音调的变速，多声道逐声道处理
+
+    返回:
+    - 变速后的16位PCM字节
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels)
+        stretched = [stretch(samples[:, c], speed_factor, sample_rate) for c in range(channels)]
+        length = min(len(s) for s in stretched)
+        result = np.stack([s[:length] for s in stretched], axis=1).reshape(-1)
+    else:
+        result = stretch(samples, speed_factor, sample_rate)
+    return (np.clip(result, -1.0, 1.0) * 32767.0).astype(np.int16).tobytes()
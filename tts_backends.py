@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语音合成后端
+统一接口 synthesize(text, lang, tld, slow) -> MP3字节
+- gtts: 调用Google翻译TTS（需要网络），共享连接池，按TLD限流、熔断并重试
+- stub: 本地离线替身，按文本长度生成与gTTS格式、大小一致的静音MP3，可配置模拟延迟，用于压测和CI
+"""
+
+import re
+import math
+import time
+import base64
+import random
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit
+
+from upstream import CircuitBreaker, TokenBucket, UpstreamError, backoff_delay, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+class TTSBackend:
+    """语音合成后端基类"""
+
+    name = 'base'
+
+    def synthesize(self, text, lang, tld, slow):
+        """
+        合成单个片段
+
+        参数:
+        - text: 片段文本
+        - lang: 语言代码
+        - tld: Google域名后缀
+        - slow: 是否慢速
+
+        返回:
+        - MP3字节
+        """
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """
+    gTTS后端
+    由gTTS负责分词和构造请求，请求通过共享的连接池发送（keep-alive），
+    并按TLD分别限流、熔断，遇到429/5xx和网络错误时带抖动地指数退避重试
+
+    参数:
+    - base_url: 替换 https://translate.google.<tld> 的地址，用于指向本地模拟服务
+    - pool_size: 每个域名的最大连接数
+    - rate: 每个TLD每秒最多请求数，0表示不限
+    - burst: 每个TLD允许的突发请求数
+    - retries: 最多重试次数
+    - backoff: 指数退避的初始等待（秒）
+    - backoff_max: 单次等待上限（秒）
+    - timeout: 单次请求超时（秒）
+    - breaker_threshold: 触发熔断的连续失败次数
+    - breaker_reset: 熔断持续时间（秒）
+    """
+
+    name = 'gtts'
+
+    _AUDIO = re.compile(r'jQ1olc","\[\\"(.*)\\"]')
+
+    def __init__(self, base_url=None, pool_size=16, rate=5.0, burst=10, retries=4, backoff=0.5,
+                 backoff_max=8.0, timeout=15.0, breaker_threshold=10, breaker_reset=30.0):
+        from gtts import gTTS
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._gTTS = gTTS
+        self._requests = requests
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 与gTTS一致：不校验证书（兼容代理），并关闭相应警告
+        self.session.verify = False
+        requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
+
+        self._lock = threading.Lock()
+        self._limiters = {}
+        self._breakers = {}
+        self._retries = {}
+
+    def _guards(self, tld):
+        """TLD对应的限流器和熔断器"""
+        with self._lock:
+            if tld not in self._limiters:
+                self._limiters[tld] = TokenBucket(self.rate, self.burst)
+                self._breakers[tld] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+                self._retries[tld] = 0
+            return self._limiters[tld], self._breakers[tld]
+
+    def synthesize(self, text, lang, tld, slow):
+        tts = self._gTTS(text=text, lang=lang, tld=tld, slow=slow)
+        audio = bytearray()
+        # 长文本由gTTS拆成多个请求，依次发送
+        for prepared in tts._prepare_requests():
+            if self.base_url:
+                prepared.url = self.base_url + urlsplit(prepared.url).path
+            audio += self._send(prepared, tld)
+        return bytes(audio)
+
+    def _send(self, prepared, tld):
+        limiter, breaker = self._guards(tld)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            limiter.acquire()
+            try:
+                audio = self._request(prepared)
+            except UpstreamError as e:
+                if not e.retryable:
+                    # 请求本身有误，上游是正常的
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if attempt >= self.retries:
+                    raise UpstreamError(f"{e}（已重试 {attempt} 次）", e.status) from e
+                delay = min(self.backoff_max, e.retry_after) if e.retry_after is not None else \
+                    backoff_delay(attempt, self.backoff, self.backoff_max)
+                logger.warning(f"gTTS请求失败 ({tld}): {e}，{delay:.2f} 秒后重试")
+                with self._lock:
+                    self._retries[tld] += 1
+                attempt += 1
+                time.sleep(delay)
+            except BaseException:
+                breaker.record_failure()
+                raise
+            else:
+                breaker.record_success()
+                return audio
+
+    def _request(self, prepared):
+        """发送一次请求并从响应中取出音频"""
+        try:
+            response = self.session.send(prepared, timeout=self.timeout)
+        except self._requests.RequestException as e:
+            raise UpstreamError(f"网络错误: {e}")
+        if response.status_code >= 400:
+            raise UpstreamError(
+                f"gTTS返回 {response.status_code}", response.status_code,
+                parse_retry_after(response.headers.get('Retry-After')),
+            )
+        for line in response.text.splitlines():
+            if 'jQ1olc' in line:
+                match = self._AUDIO.search(line)
+                if match:
+                    return base64.b64decode(match.group(1))
+                break
+        raise UpstreamError('gTTS响应中没有音频数据', response.status_code)
+
+    def upstream_stats(self):
+        """
+        各TLD的限流和熔断统计
+
+        返回:
+        - {tld: {'state', 'failures', 'openedTotal', 'rejectedTotal', 'retries', 'throttledSeconds'}}
+        """
+        with self._lock:
+            tlds = list(self._limiters)
+        stats = {}
+        for tld in tlds:
+            limiter, breaker = self._guards(tld)
+            stats[tld] = {
+                **breaker.stats(),
+                'retries': self._retries[tld],
+                'throttledSeconds': round(limiter.waited_seconds, 3),
+            }
+        return stats
+
+
+# gTTS单次请求的最大字符数，更长的文本会被拆成多次请求依次发送
+GTTS_MAX_CHARS = 100
+
+# MPEG-2 Layer III, 32kbps, 24kHz, 单声道（与gTTS输出一致）
+_MP3_FRAME_HEADER = bytes([0xFF, 0xF3, 0x44, 0xC4])
+_MP3_FRAME_SIZE = 96  # 72 * 32000 / 24000
+_MP3_FRAME_SECONDS = 576 / 24000
+
+
+class StubBackend(TTSBackend):
+    """
+    离线替身后端
+    输出由有效的静音MP3帧组成，时长按文本长度估算（中文约每字0.25秒，英文约每字母0.07秒），
+    相同输入总是得到相同输出
+    与gTTS一样把长文本按每100字符一次请求依次处理，延迟随之累加
+
+    参数:
+    - delay: 每次请求的模拟网络延迟（秒）
+    - jitter: 延迟的随机抖动比例，0表示固定延迟
+    """
+
+    name = 'stub'
+
+    def __init__(self, delay=0.0, jitter=0.0):
+        self.delay = delay
+        self.jitter = jitter
+
+    @staticmethod
+    def estimate_seconds(text, lang, slow):
+        cjk = sum(1 for char in text if '㐀' <= char <= '鿿')
+        other = sum(1 for char in text if char.isalnum()) - cjk
+        seconds = 0.3 + cjk * 0.25 + other * 0.07
+        return seconds * (1.5 if slow else 1.0)
+
+    def synthesize(self, text, lang, tld, slow):
+        if self.delay > 0:
+            # 抖动由文本决定，保证同一输入的延迟可复现
+            seed = int(hashlib.md5(f"{text}{lang}{tld}{slow}".encode('utf-8')).hexdigest()[:8], 16)
+            spread = self.jitter * (random.Random(seed).random() * 2 - 1)
+            requests = max(1, math.ceil(len(text) / GTTS_MAX_CHARS))
+            time.sleep(max(0.0, self.delay * (1 + spread)) * requests)
+
+        frames = max(1, int(self.estimate_seconds(text, lang, slow) / _MP3_FRAME_SECONDS))
+        frame = _MP3_FRAME_HEADER + bytes(_MP3_FRAME_SIZE - len(_MP3_FRAME_HEADER))
+        return frame * frames
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'stub': StubBackend,
+}
+
+
+def create_backend(name, **options):
+    """
+    按名称创建后端
+
+    参数:
+    - name: 后端名称（gtts / stub）
+    - options: 传给后端构造函数的参数
+    """
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的语音合成后端: {name}，可选: {', '.join(BACKENDS)}")
+    return backend_class(**options)
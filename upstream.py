@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游服务调用保护
+- TokenBucket: 令牌桶限流，按Google域名（TLD）分别限制请求速率
+- CircuitBreaker: 熔断器，上游连续失败后暂停请求，冷却后放行一个探测请求
+- backoff_delay: 带随机抖动的指数退避
+"""
+
+import time
+import random
+import threading
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class UpstreamError(Exception):
+    """上游请求失败"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        """网络错误、429和5xx可以重试"""
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class CircuitOpenError(UpstreamError):
+    """熔断期间拒绝请求"""
+
+
+class TokenBucket:
+    """
+    令牌桶：平均每秒rate个请求，最多连续burst个
+
+    参数:
+    - rate: 每秒补充的令牌数，0表示不限
+    - burst: 桶容量
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self):
+        """按经过的时间补充令牌（调用方需持有锁）"""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """不等待地取一个令牌，没有令牌时返回False"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self):
+        """取一个令牌，没有令牌时等待；返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            # 先预支令牌再在锁外等待，排队的请求按到达顺序依次放行
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败failure_threshold次后打开，reset_timeout秒内直接拒绝请求；
+    冷却后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+
+    参数:
+    - failure_threshold: 触发熔断的连续失败次数
+    - reset_timeout: 熔断持续时间（秒）
+    """
+
+    def __init__(self, failure_threshold=10, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """请求前检查，熔断期间抛出CircuitOpenError"""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected_total += 1
+                    raise CircuitOpenError('上游服务暂时不可用（熔断中）', retry_after=remaining)
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected_total += 1
+                    raise CircuitOpenError('上游服务暂时不可用（等待探测结果）', retry_after=1.0)
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened_total += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'openedTotal': self.opened_total,
+                'rejectedTotal': self.rejected_total,
+            }
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0, rng=random):
+    """第attempt次重试前的等待时间：在 [0, min(cap, base*2^attempt)] 内均匀随机（full jitter）"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """解析Retry-After头（秒数），无法解析时返回None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
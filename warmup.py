@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存预热
+从词表（xlsx/csv/parquet/txt）读取常用词，提前合成片段缓存（可选同时生成结果文件），
+部署后用户的第一批请求即可命中缓存，不必等待gTTS
+
+- 分段和语言/TLD选择直接调用正式合成的 plan_segments，保证缓存键相同
+- 已缓存的片段直接跳过，中断后重新运行即从中断处继续
+- 限速、线程数少，并在有正常请求处理时让路，不与线上流量争抢
+
+用法:
+    python warmup.py 音频缺少数据_cleaned.xlsx --columns C,J --workers 2 --rate 2 --report warmup_report.json
+服务器启动时预热：设置 TTS_WARMUP_FILE（见README）
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from sheet_reader import iter_rows
+from upstream import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+def iter_terms(path, columns=('C', 'J')):
+    """逐行读取词表中指定列的词，去掉空值和重复"""
+    seen = set()
+    for _, values in iter_rows(path, columns):
+        for value in values:
+            if value is None:
+                continue
+            term = str(value).strip()
+            if term and term.lower() != 'nan' and term not in seen:
+                seen.add(term)
+                yield term
+
+
+class WarmupReport:
+    """预热进度与覆盖率"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.terms = 0
+        self.segments = 0
+        self.cached = 0
+        self.warmed = 0
+        self.failed = 0
+        self.results = 0
+        self.started = time.time()
+        self.finished = None
+
+    def add(self, **counts):
+        with self._lock:
+            for name, amount in counts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def to_dict(self):
+        with self._lock:
+            covered = self.cached + self.warmed
+            return {
+                'terms': self.terms,
+                'segments': self.segments,
+                'alreadyCached': self.cached,
+                'warmed': self.warmed,
+                'failed': self.failed,
+                'results': self.results,
+                'coverage': round(covered / self.segments, 4) if self.segments else 1.0,
+                'running': self.finished is None,
+                'seconds': round((self.finished or time.time()) - self.started, 1),
+            }
+
+
+class Warmup:
+    """
+    预热任务
+
+    参数:
+    - plan_segments: plan_segments(文本, slow) -> [(片段文本, 语言, TLD, slow), ...]
+    - segment_cached: segment_cached(片段任务) -> 是否已缓存
+    - synthesize_segment: synthesize_segment(片段文本, 语言, TLD, slow)，合成并写入片段缓存
+    - render_text: 可选，render_text(文本, 语速)，同时生成结果文件
+    - workers: 并发数
+    - rate: 每秒最多合成的片段数，0表示不限
+    - speeds: 预热的语速档位
+    - busy: 可选，返回当前正在处理的正常请求数；大于0时暂停预热
+    - max_yield: 每个片段最多为正常请求让路的秒数，避免持续有流量时永远无法预热
+    """
+
+    def __init__(self, plan_segments, segment_cached, synthesize_segment, render_text=None,
+                 workers=2, rate=2.0, speeds=(2,), busy=None, max_yield=5.0):
+        self.plan_segments = plan_segments
+        self.segment_cached = segment_cached
+        self.synthesize_segment = synthesize_segment
+        self.render_text = render_text
+        self.workers = workers
+        self.limiter = TokenBucket(rate, workers)
+        self.speeds = tuple(speeds)
+        self.slow_modes = sorted({speed <= 1 for speed in self.speeds})
+        self.busy = busy
+        self.max_yield = max_yield
+        self.report = WarmupReport()
+        self._rendering = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _yield_to_traffic(self):
+        """有正常请求在处理时等待（不计预热自己生成结果文件的请求）"""
+        if self.busy is None:
+            return
+        deadline = time.monotonic() + self.max_yield
+        while not self._stopping.is_set() and time.monotonic() < deadline:
+            with self._lock:
+                own = self._rendering
+            if self.busy() - own <= 0:
+                return
+            time.sleep(0.1)
+
+    def warm_term(self, term):
+        """预热一个词的所有片段，已缓存的跳过"""
+        for slow in self.slow_modes:
+            for task in self.plan_segments(term, slow):
+                if self._stopping.is_set():
+                    return
+                self.report.add(segments=1)
+                if self.segment_cached(task):
+                    self.report.add(cached=1)
+                    continue
+                self._yield_to_traffic()
+                self.limiter.acquire()
+                try:
+                    self.synthesize_segment(*task)
+                except Exception as e:
+                    logger.warning(f"预热失败: {task[0]} ({task[1]}): {e}")
+                    self.report.add(failed=1)
+                else:
+                    self.report.add(warmed=1)
+
+        if self.render_text is None:
+            return
+        for speed in self.speeds:
+            # 片段已在缓存中，生成结果文件只需解码和拼接
+            with self._lock:
+                self._rendering += 1
+            try:
+                filename, _, _ = self.render_text(term, speed)
+            finally:
+                with self._lock:
+                    self._rendering -= 1
+            if filename:
+                self.report.add(results=1)
+
+    def run(self, terms):
+        """
+        预热词表；terms可以是生成器，同时提交的任务数有上限，内存占用与词表大小无关
+
+        返回:
+        - 覆盖率报告字典
+        """
+        window = self.workers * 4
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='warmup') as executor:
+            pending = set()
+            for term in terms:
+                if self._stopping.is_set():
+                    break
+                self.report.add(terms=1)
+                pending.add(executor.submit(self.warm_term, term))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+            wait(pending)
+        self.report.finished = time.time()
+        return self.report.to_dict()
+
+
+def create_warmup(server, workers=2, rate=2.0, speeds=(2,), results=False, busy=None):
+    """用服务器模块中的合成流程创建预热任务"""
+    from segment_cache import make_segment_key
+
+    return Warmup(
+        plan_segments=server.plan_segments,
+        segment_cached=lambda task: server.segment_cache.contains(make_segment_key(*task)),
+        synthesize_segment=server.synthesize_segment,
+        render_text=server.render_text if results else None,
+        workers=workers,
+        rate=rate,
+        speeds=speeds,
+        busy=busy,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='从词表预热片段缓存')
+    parser.add_argument('vocabulary', help='词表文件（xlsx / csv / parquet / txt）')
+    parser.add_argument('--columns', default='C,J', help='读取的列（xlsx/csv），逗号分隔')
+    parser.add_argument('--workers', type=int, default=2, help='并发数')
+    parser.add_argument('--rate', type=float, default=2.0, help='每秒最多合成的片段数，0表示不限')
+    parser.add_argument('--speeds', default='2', help='预热的语速档位，逗号分隔（0~4）')
+    parser.add_argument('--results', action='store_true', help='同时生成结果文件（output目录）')
+    parser.add_argument('--nice', type=int, default=10, help='降低本进程的调度优先级')
+    parser.add_argument('--report', help='覆盖率报告输出路径（JSON）')
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    if args.nice and hasattr(os, 'nice'):
+        os.nice(args.nice)
+
+    # 与服务器使用同一缓存目录和输出目录（通过相同的环境变量配置）
+    import server
+
+    warmup = create_warmup(
+        server,
+        workers=args.workers,
+        rate=args.rate,
+        speeds=[int(speed) for speed in args.speeds.split(',')],
+        results=args.results,
+    )
+
+    def print_progress():
+        while warmup.report.finished is None:
+            time.sleep(5)
+            report = warmup.report.to_dict()
+            print(f"  进度: {report['terms']} 个词, {report['segments']} 个片段, "
+                  f"已缓存 {report['alreadyCached']}, 新合成 {report['warmed']}, 失败 {report['failed']}",
+                  file=sys.stderr)
+
+    threading.Thread(target=print_progress, daemon=True).start()
+    try:
+        report = warmup.run(iter_terms(args.vocabulary, args.columns.split(',')))
+    except KeyboardInterrupt:
+        warmup.stop()
+        warmup.report.finished = time.time()
+        report = warmup.report.to_dict()
+        print("已中断，重新运行会跳过已缓存的片段", file=sys.stderr)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
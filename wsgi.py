@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI入口，供gunicorn等外部服务器使用：
+    gunicorn -w 4 --threads 8 -k gthread --graceful-timeout 30 wsgi:app
+工作进程退出前会等待进行中的合成完成
+"""
+
+import os
+import atexit
+
+import server
+
+app = server.create_app()
+
+atexit.register(server.drain, int(os.environ.get('TTS_GRACEFUL_TIMEOUT', '30')))